@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ChunkAudioCache:
+    """
+    Content-addressed cache for raw PCM returned by Gemini for a single text chunk.
+
+    Entries live in an in-memory LRU bounded by a byte budget. When a cache
+    directory is configured, entries are also written to disk (one file per key)
+    and memory misses fall through to the disk tier, which has its own budget.
+    """
+    def __init__(self, max_memory_bytes: int, disk_dir: Optional[str] = None, max_disk_bytes: int = 0, enabled: bool = True):
+        self.enabled = enabled
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_sizes = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "stores": 0, "memory_evictions": 0, "disk_evictions": 0,
+        }
+        if self.enabled and self.disk_dir:
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(model: str, voice_api_name: str, temperature: float, text: str) -> str:
+        """Stable key for one chunk request."""
+        raw = json.dumps([model, voice_api_name, round(float(temperature), 4), text], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.pcm"
+
+    def _load_disk_index(self):
+        """Index existing disk entries, oldest access first, so eviction survives restarts."""
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            entries = []
+            for path in self.disk_dir.glob("*/*.pcm"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            for _, key, size in sorted(entries):
+                self._disk_sizes[key] = size
+                self._disk_bytes += size
+            logger.info(f"Chunk cache disk tier at {self.disk_dir}: {len(self._disk_sizes)} entries, {self._disk_bytes} bytes")
+        except OSError as e:
+            logger.error(f"Chunk cache disk tier unavailable ({self.disk_dir}): {e}. Using memory only.")
+            self.disk_dir = None
+
+    def _store_memory(self, key: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._stats["memory_evictions"] += 1
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+            return data
+
+    def _get_disk(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._disk_sizes:
+                return None
+            self._disk_sizes.move_to_end(key)
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                size = self._disk_sizes.pop(key, 0)
+                self._disk_bytes -= size
+            return None
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        self._store_memory(key, data)
+        return data
+
+    def _put_disk(self, key: str, data: bytes):
+        if len(data) > self.max_disk_bytes:
+            return
+        with self._lock:
+            if key in self._disk_sizes:
+                return
+        path = self._disk_path(key)
+        # Unique per writer: another thread or worker process may be storing the same key
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Chunk cache: failed to write {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        evict = []
+        with self._lock:
+            self._disk_sizes[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.max_disk_bytes and self._disk_sizes:
+                old_key, size = self._disk_sizes.popitem(last=False)
+                self._disk_bytes -= size
+                self._stats["disk_evictions"] += 1
+                evict.append(old_key)
+        for old_key in evict:
+            try:
+                self._disk_path(old_key).unlink()
+            except OSError:
+                pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Look a chunk up in memory, then on disk. Returns None on a miss."""
+        if not self.enabled:
+            return None
+        data = self._get_memory(key)
+        if data is None and self.disk_dir:
+            data = await asyncio.to_thread(self._get_disk, key)
+        if data is None:
+            with self._lock:
+                self._stats["misses"] += 1
+        return data
+
+    async def put(self, key: str, data: bytes):
+        """Store a chunk in memory and, if configured, on disk."""
+        if not self.enabled or not data:
+            return
+        self._store_memory(key, data)
+        with self._lock:
+            self._stats["stores"] += 1
+        if self.disk_dir:
+            await asyncio.to_thread(self._put_disk, key, data)
+
+    def clear(self):
+        """Drop the in-memory tier. Disk entries are kept."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self._stats,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.max_memory_bytes,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+                "disk_entries": len(self._disk_sizes),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.max_disk_bytes if self.disk_dir else 0,
+            }
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import struct
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Gemini returns 16-bit little-endian mono PCM
+SAMPLE_WIDTH_BYTES = 2
+CHANNELS = 1
+
+# Placeholder RIFF/data sizes for WAV streams whose final length is unknown
+STREAMING_WAV_SIZE = 0xFFFFFFFF
+
+MIME_TYPES = {"wav": "audio/wav", "mp3": "audio/mp3", "flac": "audio/flac"}
+
+class EncoderError(Exception):
+    pass
+
+class EncoderBusyError(EncoderError):
+    """Raised when the encoder pool's wait queue is full."""
+    pass
+
+def wav_header(data_length: int, sample_rate: int) -> bytes:
+    """Builds a 44-byte PCM WAV header for `data_length` bytes of 16-bit mono audio."""
+    byte_rate = sample_rate * CHANNELS * SAMPLE_WIDTH_BYTES
+    block_align = CHANNELS * SAMPLE_WIDTH_BYTES
+    if data_length >= STREAMING_WAV_SIZE - 36:
+        riff_size = data_size = STREAMING_WAV_SIZE
+    else:
+        riff_size, data_size = 36 + data_length, data_length
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, CHANNELS, sample_rate, byte_rate, block_align, SAMPLE_WIDTH_BYTES * 8)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+WAV_HEADER_BYTES = 44
+
+class PCMAssembler:
+    """
+    Accumulates raw 16-bit mono PCM chunks into one contiguous buffer.
+
+    Space for the WAV header is reserved at the front of the buffer, so the
+    finished WAV is produced by filling in the header in place rather than by
+    re-concatenating segments.
+    """
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._buffer = bytearray(WAV_HEADER_BYTES)
+        self.chunk_count = 0
+
+    def append(self, pcm: bytes):
+        self._buffer += pcm
+        self.chunk_count += 1
+
+    def __len__(self) -> int:
+        return len(self._buffer) - WAV_HEADER_BYTES
+
+    def pcm_view(self) -> memoryview:
+        """Zero-copy view of the PCM payload (without header)."""
+        return memoryview(self._buffer)[WAV_HEADER_BYTES:]
+
+    def to_wav(self) -> bytes:
+        self._buffer[:WAV_HEADER_BYTES] = wav_header(len(self), self.sample_rate)
+        return bytes(self._buffer)
+
+def _ffmpeg_binary() -> str:
+    # Use the same converter pydub resolved (honours AudioSegment.converter overrides)
+    from pydub import AudioSegment
+    return AudioSegment.converter
+
+def _ffmpeg_args(target_fmt: str, sample_rate: int) -> list:
+    return [
+        "-hide_banner", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", str(CHANNELS), "-i", "pipe:0",
+        "-f", target_fmt, "pipe:1",
+    ]
+
+async def encode_pcm(pcm, target_fmt: str, sample_rate: int) -> bytes:
+    """Encodes a contiguous PCM buffer to MP3/FLAC by piping it through an ffmpeg subprocess."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            _ffmpeg_binary(), *_ffmpeg_args(target_fmt, sample_rate),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+    except OSError as e:
+        raise EncoderError(f"Could not start ffmpeg for {target_fmt} encoding: {e}") from e
+    try:
+        stdout, stderr = await proc.communicate(input=pcm)
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    if proc.returncode != 0:
+        raise EncoderError(f"ffmpeg {target_fmt} encoding failed: {stderr.decode(errors='replace').strip()[:500]}")
+    return stdout
+
+async def encode_pcm_stream(pcm_chunks: AsyncIterator[bytes], target_fmt: str, sample_rate: int) -> AsyncIterator[bytes]:
+    """
+    Pipes raw PCM through an ffmpeg subprocess and yields encoded MP3/FLAC bytes
+    as soon as the encoder emits them. Errors from `pcm_chunks` are re-raised.
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            _ffmpeg_binary(), *_ffmpeg_args(target_fmt, sample_rate),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+    except OSError as e:
+        raise EncoderError(f"Could not start ffmpeg for {target_fmt} encoding: {e}") from e
+
+    async def feed():
+        try:
+            async for pcm in pcm_chunks:
+                proc.stdin.write(pcm)
+                await proc.stdin.drain()
+        finally:
+            proc.stdin.close()
+
+    def raise_if_feed_failed():
+        if feeder.done() and not feeder.cancelled() and feeder.exception() is not None:
+            raise feeder.exception()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while True:
+            data = await proc.stdout.read(64 * 1024)
+            raise_if_feed_failed()
+            if not data:
+                break
+            yield data
+        await feeder
+        stderr = await proc.stderr.read()
+        if await proc.wait() != 0:
+            raise EncoderError(f"ffmpeg {target_fmt} encoding failed: {stderr.decode(errors='replace').strip()[:500]}")
+    finally:
+        if not feeder.done():
+            feeder.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+class EncoderPool:
+    """
+    Bounds how many ffmpeg encoder processes run at once. Jobs beyond
+    `max_workers` wait for a slot; once `max_queue` jobs are already waiting,
+    new jobs are rejected with EncoderBusyError instead of piling up.
+    """
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self.active = 0
+        self.waiting = 0
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0, "encode_seconds_total": 0.0}
+
+    def check_admission(self):
+        """Raises EncoderBusyError if a new encode job would be rejected right now."""
+        if self.active >= self.max_workers and self.waiting >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise EncoderBusyError(f"Encoder queue full ({self.waiting} waiting, {self.active} running).")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one encoder slot for the duration of the block."""
+        self.check_admission()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        started = time.perf_counter()
+        try:
+            yield
+            self._stats["completed"] += 1
+        except BaseException:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._stats["encode_seconds_total"] += time.perf_counter() - started
+            self.active -= 1
+            self._slots.release()
+
+    async def encode(self, pcm, target_fmt: str, sample_rate: int) -> bytes:
+        async with self.slot():
+            with metrics.timed(metrics.ENCODE_SECONDS, "encode", format=target_fmt):
+                return await encode_pcm(pcm, target_fmt, sample_rate)
+
+    async def encode_stream(self, pcm_chunks: AsyncIterator[bytes], target_fmt: str, sample_rate: int) -> AsyncIterator[bytes]:
+        # Includes time spent waiting on upstream PCM, so this is a per-stream wall time
+        async with self.slot():
+            with metrics.timed(metrics.ENCODE_SECONDS, format=f"{target_fmt}_stream"):
+                async for encoded in encode_pcm_stream(pcm_chunks, target_fmt, sample_rate):
+                    yield encoded
+
+    def stats(self) -> Dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.waiting,
+            **self._stats,
+        }
@@ -0,0 +1,141 @@
+"""
+Optional clean-up of chunk PCM before it is assembled or encoded. Needs numpy;
+tts_client imports this module only when post-processing is enabled.
+"""
+import logging
+import time
+from typing import Dict
+
+import numpy as np
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Window over which loudness and silence are measured
+FRAME_MS = 10
+
+# Gain changes between chunks are ramped over this long, so they never step
+GAIN_RAMP_MS = 50
+
+_FULL_SCALE = 32768.0
+
+def _from_dbfs(dbfs: float) -> float:
+    return _FULL_SCALE * 10 ** (dbfs / 20)
+
+class ChunkPostProcessor:
+    """
+    Cleans up the 16-bit mono PCM of one task's chunks, fed in order as they arrive:
+
+    - leading/trailing silence of each chunk is cut down to `keep_silence_ms`,
+      so the pause at every seam is the same length;
+    - each chunk's speech is brought to `target_dbfs` (RMS of its non-silent
+      frames) in one pass over the chunk: the gain is capped at
+      +/-`max_gain_db`, ramped from the previous chunk's gain, and lowered
+      where it would clip;
+    - consecutive chunks overlap by `crossfade_ms` with a linear crossfade, so
+      seams cannot click. The last `crossfade_ms` of each chunk is held back
+      until the next one arrives (or `final` is passed).
+
+    Everything is vectorized over the chunk, and the CPU time per second of
+    audio is measured against `cpu_budget_ms`.
+    """
+    def __init__(
+        self, sample_rate: int, silence_threshold_dbfs: float = -50.0, keep_silence_ms: float = 150.0,
+        crossfade_ms: float = 15.0, target_dbfs: float = -20.0, max_gain_db: float = 12.0,
+        cpu_budget_ms: float = 5.0
+    ):
+        self.sample_rate = sample_rate
+        self.frame = max(1, sample_rate * FRAME_MS // 1000)
+        self.silence_threshold = _from_dbfs(silence_threshold_dbfs)
+        self.keep_silence = int(sample_rate * keep_silence_ms / 1000)
+        self.crossfade = int(sample_rate * crossfade_ms / 1000)
+        self.gain_ramp = int(sample_rate * GAIN_RAMP_MS / 1000)
+        self.target_rms = _from_dbfs(target_dbfs)
+        self.max_gain = 10 ** (max_gain_db / 20)
+        self.cpu_budget_ms = cpu_budget_ms
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._gain = None
+        self._stats = {"chunks": 0, "audio_seconds": 0.0, "cpu_seconds": 0.0, "trimmed_seconds": 0.0, "over_budget": 0}
+
+    def _frame_rms(self, samples: np.ndarray) -> np.ndarray:
+        count = len(samples) // self.frame
+        frames = samples[:count * self.frame].reshape(count, self.frame)
+        return np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+
+    def _trim(self, samples: np.ndarray):
+        """The chunk without excess edge silence, and the RMS of its speech frames."""
+        rms = self._frame_rms(samples)
+        active = np.flatnonzero(rms >= self.silence_threshold)
+        if not active.size:
+            # A silent chunk still stands for a pause
+            return samples[:2 * self.keep_silence], active
+        start = max(0, int(active[0]) * self.frame - self.keep_silence)
+        end = min(len(samples), (int(active[-1]) + 1) * self.frame + self.keep_silence)
+        return samples[start:end], rms[active]
+
+    def _next_gain(self, speech_rms: np.ndarray) -> float:
+        if not speech_rms.size:
+            # Nothing to measure: keep the previous chunk's gain
+            return self._gain or 1.0
+        loudness = float(np.sqrt(np.mean(np.square(speech_rms, dtype=np.float64))))
+        return float(np.clip(self.target_rms / max(loudness, 1.0), 1 / self.max_gain, self.max_gain))
+
+    def _apply_gain(self, samples: np.ndarray, gain: float) -> np.ndarray:
+        audio = samples.astype(np.float32)
+        previous = self._gain if self._gain is not None else gain
+        if previous != gain:
+            ramp = min(self.gain_ramp, len(audio))
+            gains = np.full(len(audio), gain, dtype=np.float32)
+            gains[:ramp] = np.linspace(previous, gain, ramp, dtype=np.float32)
+            audio *= gains
+        else:
+            audio *= gain
+        peak = float(np.max(np.abs(audio))) if len(audio) else 0.0
+        if peak > _FULL_SCALE - 1:
+            audio *= (_FULL_SCALE - 1) / peak
+        self._gain = gain
+        return audio
+
+    def _crossfade(self, audio: np.ndarray) -> np.ndarray:
+        overlap = min(len(self._tail), len(audio))
+        if overlap:
+            fade = np.linspace(1.0, 0.0, overlap, dtype=np.float32)
+            audio[:overlap] = self._tail[-overlap:] * fade + audio[:overlap] * (1.0 - fade)
+            audio = np.concatenate((self._tail[:-overlap], audio))
+        else:
+            audio = np.concatenate((self._tail, audio))
+        return audio
+
+    def process(self, pcm: bytes, final: bool = False) -> bytes:
+        """Returns the processed PCM of this chunk (plus the held-back end of the previous one)."""
+        started = time.thread_time()
+        samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+        trimmed, speech_rms = self._trim(samples)
+        audio = self._crossfade(self._apply_gain(trimmed, self._next_gain(speech_rms)))
+        held = 0 if final else min(self.crossfade, len(audio))
+        self._tail = audio[len(audio) - held:].copy()
+        out = np.rint(audio[:len(audio) - held]).astype("<i2").tobytes()
+
+        cpu_seconds = time.thread_time() - started
+        audio_seconds = len(samples) / self.sample_rate
+        self._stats["chunks"] += 1
+        self._stats["audio_seconds"] += audio_seconds
+        self._stats["cpu_seconds"] += cpu_seconds
+        self._stats["trimmed_seconds"] += (len(samples) - len(trimmed)) / self.sample_rate
+        metrics.record_stage("postprocess", cpu_seconds)
+        if audio_seconds > 0:
+            cpu_ms_per_second = cpu_seconds * 1000 / audio_seconds
+            metrics.POSTPROCESS_CPU_MS_PER_AUDIO_SECOND.observe(cpu_ms_per_second)
+            if cpu_ms_per_second > self.cpu_budget_ms:
+                self._stats["over_budget"] += 1
+                logger.warning(f"Audio post-processing used {cpu_ms_per_second:.1f} ms CPU per second of audio (budget {self.cpu_budget_ms} ms)")
+        return out
+
+    def stats(self) -> Dict:
+        audio_seconds = self._stats["audio_seconds"]
+        return {
+            **{k: round(v, 4) if isinstance(v, float) else v for k, v in self._stats.items()},
+            "cpu_ms_per_audio_second": round(self._stats["cpu_seconds"] * 1000 / audio_seconds, 3) if audio_seconds else None,
+            "gain_db": round(20 * float(np.log10(self._gain)), 2) if self._gain else None,
+        }
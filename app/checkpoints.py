@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job ids become directory names
+_JOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def valid_job_id(job_id: str) -> bool:
+    return bool(_JOB_ID_RE.match(job_id))
+
+def _write_atomically(path: Path, data: bytes):
+    """Writes under a temporary name unique to this writer, then renames into place."""
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
+
+class JobCheckpoint:
+    """
+    Per-chunk PCM of one job on disk. A chunk counts as done once its file
+    exists; files are written under a temporary name and renamed into place,
+    so a crash never leaves a partial chunk behind.
+    """
+    def __init__(self, directory: Path, chunk_keys: List[str]):
+        self.directory = directory
+        self.chunk_keys = chunk_keys
+        self._done = {i for i in range(len(chunk_keys)) if self._chunk_path(i).exists()}
+
+    def _chunk_path(self, index: int) -> Path:
+        return self.directory / f"chunk_{index:05d}.pcm"
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.chunk_keys)
+
+    @property
+    def completed_count(self) -> int:
+        return len(self._done)
+
+    def has(self, index: int) -> bool:
+        return index in self._done
+
+    def missing(self) -> List[int]:
+        return [i for i in range(self.chunk_count) if i not in self._done]
+
+    def save(self, index: int, pcm: bytes):
+        _write_atomically(self._chunk_path(index), pcm)
+        self._done.add(index)
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Reads the chunks back in order, one whole chunk at a time."""
+        for index in range(self.chunk_count):
+            yield self._chunk_path(index).read_bytes()
+
+    def iter_pcm(self, block_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Reads the chunks back in order, `block_size` bytes at a time."""
+        for index in range(self.chunk_count):
+            with open(self._chunk_path(index), "rb") as f:
+                while True:
+                    block = f.read(block_size)
+                    if not block:
+                        break
+                    yield block
+
+    def output_path(self, audio_format: str) -> Path:
+        return self.directory / f"output.{audio_format}"
+
+    def discard_chunks(self):
+        """Drops the chunk files once the output has been assembled."""
+        for index in range(self.chunk_count):
+            self._chunk_path(index).unlink(missing_ok=True)
+        self._done.clear()
+
+class CheckpointStore:
+    """
+    Directory of job checkpoints: `<root>/<job_id>/` holds the job's
+    parameters (params.json, written when the job is submitted), the chunk
+    manifest (manifest.json, one cache key per chunk), the chunk PCM files and
+    finally the assembled output. Directories untouched for `ttl_seconds`
+    are removed.
+    """
+    # Expired checkpoints are looked for at most this often
+    PURGE_INTERVAL_SECONDS = 600
+
+    def __init__(self, root: str, enabled: bool = True, ttl_seconds: float = 86400):
+        self.enabled = enabled
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+        self._stats = {"opened": 0, "resumed": 0, "chunks_reused": 0, "purged": 0}
+        if self.enabled:
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, job_id: str) -> Path:
+        if not valid_job_id(job_id):
+            raise ValueError(f"Invalid job id for a checkpoint: {job_id!r}")
+        return self.root / job_id
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict):
+        _write_atomically(path, json.dumps(data).encode())
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict]:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def write_params(self, job_id: str, params: Dict):
+        directory = self._dir(job_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._write_json(directory / "params.json", params)
+
+    def read_params(self, job_id: str) -> Optional[Dict]:
+        return self._read_json(self._dir(job_id) / "params.json")
+
+    def open(self, job_id: str, chunk_keys: List[str]) -> JobCheckpoint:
+        """
+        Opens the checkpoint of `job_id` for these chunks. Chunks saved by an
+        earlier run are reused only if the chunk list is unchanged; otherwise
+        the old chunks and output are discarded.
+        """
+        self.purge_expired()
+        directory = self._dir(job_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_json(directory / "manifest.json")
+        if manifest is None or manifest.get("chunk_keys") != chunk_keys:
+            for path in list(directory.glob("chunk_*")) + list(directory.glob("output.*")):
+                path.unlink(missing_ok=True)
+            self._write_json(directory / "manifest.json", {"job_id": job_id, "chunk_keys": chunk_keys, "created_at": time.time()})
+        checkpoint = JobCheckpoint(directory, chunk_keys)
+        self._stats["opened"] += 1
+        if checkpoint.completed_count:
+            self._stats["resumed"] += 1
+            self._stats["chunks_reused"] += checkpoint.completed_count
+            logger.info(f"Job {job_id}: resuming from checkpoint with {checkpoint.completed_count}/{checkpoint.chunk_count} chunks done")
+        return checkpoint
+
+    def find_output(self, job_id: str, audio_format: str) -> Optional[Path]:
+        """The assembled `audio_format` output of a finished job, if it is still on disk."""
+        if not self.enabled or not valid_job_id(job_id):
+            return None
+        path = self.root / job_id / f"output.{audio_format.lower()}"
+        return path if path.is_file() else None
+
+    def remove(self, job_id: str):
+        shutil.rmtree(self._dir(job_id), ignore_errors=True)
+
+    def purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        cutoff = now - self.ttl_seconds
+        for directory in self.root.iterdir():
+            try:
+                newest = max([p.stat().st_mtime for p in directory.iterdir()] or [directory.stat().st_mtime])
+            except OSError:
+                continue
+            if newest < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                self._stats["purged"] += 1
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "dir": str(self.root), **self._stats}
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class CallTimer:
+    """
+    Times the HTTP calls of one hedged request, which wraps each call in
+    `with timer:`. Time outside calls (rate limiter waits, retry backoff) is
+    not service latency, so it neither triggers a hedge nor becomes a sample.
+    """
+    def __init__(self):
+        self.started: Optional[float] = None  # when the call in flight went out; None between calls
+        self.seconds: Optional[float] = None  # how long the last finished call took
+        self.changed = asyncio.Event()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.changed.set()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.started
+        self.started = None
+        self.changed.set()
+
+class RequestHedger:
+    """
+    Sends a duplicate ("hedge") of a chunk request that has not answered
+    within the recent `percentile` latency, and keeps whichever answers first.
+
+    Latencies are tracked per character over the last `window` successful
+    requests, so the threshold scales with chunk length. Hedges are paid for
+    from a budget that earns `budget_fraction` of a hedge per primary request
+    (capped at `budget_burst`), which bounds the extra API quota spent.
+    """
+    def __init__(
+        self, enabled: bool, percentile: float = 0.95, min_delay_seconds: float = 2.0,
+        budget_fraction: float = 0.05, budget_burst: float = 5.0, min_samples: int = 20, window: int = 200
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay_seconds = min_delay_seconds
+        self.budget_fraction = budget_fraction
+        self.budget_burst = budget_burst
+        self.min_samples = min_samples
+        self._seconds_per_char = deque(maxlen=window)
+        self._budget = 0.0
+        self._stats = {"primaries": 0, "hedged": 0, "won": 0, "lost": 0, "failed": 0, "no_budget": 0}
+
+    def record(self, seconds: float, chars: int):
+        self._seconds_per_char.append(seconds / max(chars, 1))
+
+    def _record_call(self, timer: CallTimer, chars: int):
+        if timer.seconds is not None:
+            self.record(timer.seconds, chars)
+
+    async def _outlasts(self, request: asyncio.Future, timer: CallTimer, delay: float) -> bool:
+        """Waits until `request` finishes (False) or one of its HTTP calls has been out for `delay` seconds (True)."""
+        while not request.done():
+            timer.changed.clear()
+            timeout = None if timer.started is None else timer.started + delay - time.perf_counter()
+            if timeout is not None and timeout <= 0:
+                return True
+            changed = asyncio.ensure_future(timer.changed.wait())
+            try:
+                await asyncio.wait({request, changed}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                changed.cancel()
+        return False
+
+    def delay_for(self, chars: int) -> Optional[float]:
+        """Seconds to wait before hedging a request of `chars` characters; None until enough samples exist."""
+        if len(self._seconds_per_char) < self.min_samples:
+            return None
+        ordered = sorted(self._seconds_per_char)
+        per_char = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+        return max(self.min_delay_seconds, per_char * chars)
+
+    def _try_spend(self) -> bool:
+        if self._budget >= 1.0:
+            self._budget -= 1.0
+            return True
+        return False
+
+    async def run(self, chars: int, make_request: Callable[[CallTimer], Awaitable[T]]) -> T:
+        """
+        Runs `make_request(timer)`, hedging it with a second request if one of
+        its HTTP calls is slow. The loser is cancelled.
+        """
+        if not self.enabled:
+            return await make_request(CallTimer())
+        self._stats["primaries"] += 1
+        self._budget = min(self.budget_burst, self._budget + self.budget_fraction)
+        delay = self.delay_for(chars)
+        primary_timer = CallTimer()
+        primary = asyncio.ensure_future(make_request(primary_timer))
+        hedge = None
+        try:
+            if delay is None or not await self._outlasts(primary, primary_timer, delay):
+                result = await primary
+                self._record_call(primary_timer, chars)
+                return result
+            if not self._try_spend():
+                self._stats["no_budget"] += 1
+                metrics.HEDGED_REQUESTS.inc(outcome="no_budget")
+                result = await primary
+                self._record_call(primary_timer, chars)
+                return result
+
+            logger.info(f"Hedging chunk request after {delay:.2f}s ({chars} chars)")
+            self._stats["hedged"] += 1
+            metrics.HEDGE_DELAY_SECONDS.observe(delay)
+            hedge_timer = CallTimer()
+            hedge = asyncio.ensure_future(make_request(hedge_timer))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for winner in (primary, hedge):
+                    if winner in done and winner.exception() is None:
+                        outcome = "won" if winner is hedge else "lost"
+                        self._stats[outcome] += 1
+                        metrics.HEDGED_REQUESTS.inc(outcome=outcome)
+                        self._record_call(hedge_timer if winner is hedge else primary_timer, chars)
+                        return winner.result()
+            # Both failed: report the primary's error
+            self._stats["failed"] += 1
+            metrics.HEDGED_REQUESTS.inc(outcome="failed")
+            return primary.result()
+        finally:
+            losers = [t for t in (primary, hedge) if t is not None and not t.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "samples": len(self._seconds_per_char),
+            "budget": round(self._budget, 3),
+            "current_delay_per_1000_chars": self.delay_for(1000),
+            **self._stats,
+        }
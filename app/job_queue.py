@@ -0,0 +1,376 @@
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from .state_backend import MemoryStateBackend, StateBackend
+from .task_registry import TaskCancelledError, task_registry
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFullError(Exception):
+    """Raised when the server cannot accept more synthesis work right now."""
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class Job:
+    """A queued synthesis request and its progress/result."""
+    def __init__(self, job_id: str, params: Dict, client_id: str, priority: int, seq: int):
+        self.id = job_id
+        self.params = params
+        self.client_id = client_id
+        self.priority = priority
+        self.seq = seq
+        self.status = "queued"
+        self.chunks_done = 0
+        self.chunks_total = None
+        self.result = None  # audio bytes, or the Path of an output file on disk
+        self.mime_type = None
+        self.size_bytes = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = asyncio.Event()
+        self.listener: Optional[Callable[["Job"], None]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def set_progress(self, chunks_done: int, chunks_total: int):
+        self.chunks_done = chunks_done
+        self.chunks_total = chunks_total
+        if self.listener is not None:
+            self.listener(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "client_id": self.client_id,
+            "chunks_done": self.chunks_done,
+            "chunks_total": self.chunks_total,
+            "audio_format": self.params.get("audio_format"),
+            "mime_type": self.mime_type,
+            "size_bytes": self.size_bytes,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "audio_url": f"/api/jobs/{self.id}/audio" if self.status == "completed" else None,
+        }
+
+JobRunner = Callable[[Job], Awaitable[Tuple[Union[bytes, Path], str]]]
+
+class JobManager:
+    """
+    Runs synthesis jobs on a bounded pool of workers.
+
+    Queued jobs are kept in one FIFO per client. Workers always take the
+    highest-priority head; among equal priorities the client with the fewest
+    running jobs (then the one served least recently) goes first, so one
+    client's burst cannot starve the others. The same slot budget is shared
+    with direct /api/synthesize calls via `slot()`.
+
+    With a shared state backend, job snapshots (status, progress) and results
+    are published there, so describe(), get_result() and cancel() also work
+    for jobs owned by another worker process. Backend calls run in threads,
+    never on the event loop.
+    """
+    # Progress snapshots of one job are written to a shared backend at most this often
+    PUBLISH_INTERVAL_SECONDS = 0.5
+
+    def __init__(
+        self, runner: JobRunner, max_workers: int, max_queue: int, result_ttl_seconds: int, retry_after_seconds: int,
+        state_backend: Optional[StateBackend] = None
+    ):
+        self.runner = runner
+        self.state = state_backend or MemoryStateBackend()
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.result_ttl_seconds = result_ttl_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.jobs: Dict[str, Job] = {}
+        self._queues: Dict[str, deque] = {}
+        self._queued_count = 0
+        self._running_per_client: Dict[str, int] = {}
+        self._last_served: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._serve_counter = itertools.count()
+        self._job_available = asyncio.Condition()
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._active_slots = 0
+        self._waiting_slots = 0
+        self._workers = []
+        self._publishers: Dict[str, asyncio.Task] = {}
+        self._republish = set()
+
+    async def start(self):
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_workers)]
+        logger.info(f"Job manager started with {self.max_workers} workers (queue limit {self.max_queue})")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Let final snapshots reach the shared backend
+        await asyncio.gather(*self._publishers.values(), return_exceptions=True)
+
+    def _reject(self, what: str):
+        raise JobQueueFullError(
+            f"Server busy: {what} ({self._queued_count} queued, {self._waiting_slots} waiting, {self._active_slots} running).",
+            self.retry_after_seconds,
+        )
+
+    @asynccontextmanager
+    async def _hold_slot(self):
+        await self._slots.acquire()
+        self._active_slots += 1
+        try:
+            yield
+        finally:
+            self._active_slots -= 1
+            self._slots.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one synthesis slot; used by direct requests that bypass the job queue."""
+        if self._active_slots >= self.max_workers and self._queued_count + self._waiting_slots >= self.max_queue:
+            self._reject("no synthesis slot available")
+        self._waiting_slots += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting_slots -= 1
+        self._active_slots += 1
+        try:
+            yield
+        finally:
+            self._active_slots -= 1
+            self._slots.release()
+
+    async def submit(self, params: Dict, client_id: str, priority: int = 0, job_id: Optional[str] = None) -> Job:
+        """Queues a job and returns immediately. Raises JobQueueFullError when the queue is full."""
+        self._expire_finished()
+        if self._queued_count + self._waiting_slots >= self.max_queue:
+            self._reject("job queue full")
+        job = await self._new_job(job_id, params, client_id, priority)
+        async with self._job_available:
+            self._queues.setdefault(client_id, deque()).append(job)
+            self._queued_count += 1
+            self._job_available.notify()
+        logger.info(f"Job {job.id} queued for client {client_id} (priority {priority}, {self._queued_count} queued)")
+        return job
+
+    async def track(self, params: Dict, client_id: str, job_id: Optional[str] = None) -> Job:
+        """Records a job that the caller runs itself with run_tracked(); it is not handed to the workers."""
+        self._expire_finished()
+        return await self._new_job(job_id, params, client_id, 0)
+
+    async def _new_job(self, job_id: Optional[str], params: Dict, client_id: str, priority: int) -> Job:
+        job = Job(job_id or str(uuid.uuid4()), params, client_id, priority, next(self._seq))
+        self.jobs[job.id] = job
+        await task_registry.register(job.id)
+        if self.state.shared:
+            job.listener = self._publish
+            self._publish(job)
+        return job
+
+    def _publish(self, job: Job):
+        """
+        Schedules a write of the job's snapshot to the shared state backend.
+        One writer per job runs in a thread; updates arriving while it writes
+        (or within PUBLISH_INTERVAL_SECONDS of its last progress write) are
+        coalesced into its next write.
+        """
+        if job.id in self._publishers:
+            self._republish.add(job.id)
+            return
+        self._publishers[job.id] = asyncio.create_task(self._publish_loop(job))
+
+    async def _publish_loop(self, job: Job):
+        try:
+            while True:
+                self._republish.discard(job.id)
+                snapshot = job.to_dict()
+                result = (job.result, job.mime_type) if job.status == "completed" else None
+                if result is not None and isinstance(job.result, Path) and not self.state.shared:
+                    # Only this process reads a local backend, and it serves the file itself
+                    result = None
+                try:
+                    await asyncio.to_thread(self._write_job, job.id, snapshot, result)
+                except Exception as e:
+                    logger.warning(f"Could not publish job {job.id} to the state backend: {e}")
+                if job.id not in self._republish:
+                    return
+                if not job.finished:
+                    await asyncio.sleep(self.PUBLISH_INTERVAL_SECONDS)
+        finally:
+            self._publishers.pop(job.id, None)
+
+    def _write_job(self, job_id: str, snapshot: Dict, result: Optional[Tuple[Union[bytes, Path], str]]):
+        # The result goes first, so a "completed" snapshot is never visible without it
+        if result is not None:
+            audio, mime_type = result
+            # Other hosts cannot read this host's checkpoint directory, so they get the file's bytes
+            if isinstance(audio, Path):
+                audio = audio.read_bytes()
+            self.state.put_result(job_id, audio, mime_type, self.result_ttl_seconds)
+        self.state.put_job(job_id, snapshot, self.result_ttl_seconds)
+
+    async def run_tracked(self, job: Job, runner: Optional[JobRunner] = None):
+        """Runs a tracked job in the calling task, recording status and result like a queued job."""
+        await self._run(job, runner or self.runner)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Returns a job owned by this process."""
+        self._expire_finished()
+        return self.jobs.get(job_id)
+
+    async def describe(self, job_id: str) -> Optional[Dict]:
+        """Returns a job's snapshot, whichever worker process owns it."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return await asyncio.to_thread(self.state.get_job, job_id) if self.state.shared else None
+
+    async def get_result(self, job_id: str) -> Optional[Tuple[Union[bytes, Path], str]]:
+        """Returns (audio or output file path, mime_type) of a completed job, whichever worker process ran it."""
+        job = self.get(job_id)
+        if job is not None:
+            return (job.result, job.mime_type) if job.status == "completed" else None
+        return await asyncio.to_thread(self.state.get_result, job_id) if self.state.shared else None
+
+    async def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Cancels a queued job immediately, or signals a running one through the
+        task registry (which reaches other worker processes through the shared
+        backend). Returns the job's snapshot, or None if it is unknown.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            snapshot = await self.describe(job_id)
+            if snapshot is not None and snapshot["status"] in ("queued", "running"):
+                await task_registry.cancel(job_id)
+                snapshot["cancel_requested"] = True
+            return snapshot
+        if job.finished:
+            return job.to_dict()
+        if not self.cancel_queued(job_id):
+            await task_registry.cancel(job.id)
+        return job.to_dict()
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """
+        Drops a job of this process that is still waiting in the queue. Returns
+        False if it is not queued here (running jobs are interrupted through the
+        task registry instead).
+        """
+        job = self.jobs.get(job_id)
+        queue = self._queues.get(job.client_id) if job is not None else None
+        if job is None or job.status != "queued" or queue is None or job not in queue:
+            return False
+        queue.remove(job)
+        self._queued_count -= 1
+        if not queue:
+            del self._queues[job.client_id]
+            self._forget_if_idle(job.client_id)
+        self._finish(job, "cancelled", error="Cancelled before start")
+        task_registry.unregister(job.id)
+        return True
+
+    def stats(self) -> Dict:
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queued": self._queued_count,
+            "running_slots": self._active_slots,
+            "waiting_direct_requests": self._waiting_slots,
+            "jobs_by_status": statuses,
+            "state_backend": self.state.stats(),
+        }
+
+    def _pick_next(self) -> Job:
+        best_client, best_key = None, None
+        for client_id, queue in self._queues.items():
+            head = queue[0]
+            key = (-head.priority, self._running_per_client.get(client_id, 0), self._last_served.get(client_id, -1), head.seq)
+            if best_key is None or key < best_key:
+                best_client, best_key = client_id, key
+        queue = self._queues[best_client]
+        job = queue.popleft()
+        if not queue:
+            del self._queues[best_client]
+        self._queued_count -= 1
+        self._last_served[best_client] = next(self._serve_counter)
+        return job
+
+    def _forget_if_idle(self, client_id: str):
+        # Serving order only matters among clients with work, so an idle one leaves no entry behind
+        if client_id not in self._queues and client_id not in self._running_per_client:
+            self._last_served.pop(client_id, None)
+
+    async def _worker(self, worker_index: int):
+        while True:
+            async with self._job_available:
+                await self._job_available.wait_for(lambda: self._queued_count > 0)
+                job = self._pick_next()
+            self._running_per_client[job.client_id] = self._running_per_client.get(job.client_id, 0) + 1
+            try:
+                async with self._hold_slot():
+                    await self._run(job, self.runner)
+            finally:
+                self._running_per_client[job.client_id] -= 1
+                if not self._running_per_client[job.client_id]:
+                    del self._running_per_client[job.client_id]
+                    self._forget_if_idle(job.client_id)
+
+    async def _run(self, job: Job, runner: JobRunner):
+        if task_registry.is_cancelled(job.id):
+            self._finish(job, "cancelled", error="Cancelled before start")
+            task_registry.unregister(job.id)
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        if self.state.shared:
+            self._publish(job)
+        logger.info(f"Job {job.id} started (client {job.client_id})")
+        try:
+            job.result, job.mime_type = await runner(job)
+            self._finish(job, "completed")
+        except TaskCancelledError:
+            self._finish(job, "cancelled", error="Cancelled")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            self._finish(job, "failed", error=str(e))
+        finally:
+            task_registry.unregister(job.id)
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if job.result is not None:
+            job.size_bytes = job.result.stat().st_size if isinstance(job.result, Path) else len(job.result)
+        if self.state.shared:
+            self._publish(job)
+        job.done.set()
+        logger.info(f"Job {job.id} {status}")
+
+    def _expire_finished(self):
+        cutoff = time.time() - self.result_ttl_seconds
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
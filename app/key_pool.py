@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .rate_limiter import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+class NoUsableApiKeyError(Exception):
+    """Raised when every configured API key is disabled."""
+    pass
+
+class ApiKey:
+    """One Gemini API key with its own rate limiter, health state and usage counters."""
+    def __init__(self, label: str, key: str, limiter: AdaptiveRateLimiter):
+        self.label = label
+        self.key = key
+        self.limiter = limiter
+        self.quarantined_until = 0.0
+        self.disabled_until = 0.0
+        self.waiting = 0
+        self.usage = {"requests": 0, "chars": 0, "ok": 0, "rate_limited": 0, "forbidden": 0, "server_errors": 0, "errors": 0}
+
+    def usable(self, now: float) -> bool:
+        return now >= self.disabled_until and now >= self.quarantined_until
+
+    def stats(self, now: float) -> Dict:
+        return {
+            "label": self.label,
+            "key_suffix": self.key[-4:],
+            "state": "disabled" if now < self.disabled_until else "quarantined" if now < self.quarantined_until else "active",
+            "available_in_seconds": round(max(0.0, self.disabled_until - now, self.quarantined_until - now), 2),
+            **self.usage,
+            "rate_limiter": self.limiter.stats(),
+        }
+
+class ApiKeyPool:
+    """
+    Spreads chunk requests across several API keys.
+
+    Each key has its own AdaptiveRateLimiter, so throughput grows with the
+    number of keys. acquire() picks the usable key that can send soonest
+    (counting requests already waiting on it), preferring the one with the
+    most quota left. A 429 quarantines a key for the server's
+    Retry-After (or `quarantine_seconds`); a 403 disables it for
+    `disable_seconds`.
+    """
+    def __init__(
+        self, keys: List[Tuple[str, str]], limiter_factory: Callable[[], AdaptiveRateLimiter],
+        quarantine_seconds: float = 30.0, disable_seconds: float = 3600.0
+    ):
+        if not keys:
+            raise ValueError("ApiKeyPool needs at least one key")
+        self.keys = [ApiKey(label, key, limiter_factory()) for label, key in keys]
+        self.quarantine_seconds = quarantine_seconds
+        self.disable_seconds = disable_seconds
+
+    def _expected_wait(self, key: ApiKey, chars: int) -> float:
+        wait = key.limiter.estimate_wait(chars)
+        rate = key.limiter.request_rate
+        return wait + (key.waiting / rate if rate > 0 else float("inf"))
+
+    async def acquire(self, chars: int) -> ApiKey:
+        """Waits for a key with quota for one request of `chars` characters and returns it."""
+        while True:
+            now = time.monotonic()
+            enabled = [key for key in self.keys if now >= key.disabled_until]
+            if not enabled:
+                retry_in = min(key.disabled_until for key in self.keys) - now
+                raise NoUsableApiKeyError(f"All {len(self.keys)} API keys are disabled after 403 responses (next retry in {retry_in:.0f}s).")
+            ready = [key for key in enabled if now >= key.quarantined_until]
+            if not ready:
+                await asyncio.sleep(min(key.quarantined_until for key in enabled) - now)
+                continue
+            key = min(ready, key=lambda k: (self._expected_wait(k, chars), -k.limiter.quota_fraction))
+            key.waiting += 1
+            try:
+                await key.limiter.acquire(chars)
+            finally:
+                key.waiting -= 1
+            if not key.usable(time.monotonic()):
+                # Quarantined or disabled while we waited; the tokens are lost, pick again
+                continue
+            key.usage["requests"] += 1
+            key.usage["chars"] += chars
+            return key
+
+    def usable_count(self) -> int:
+        now = time.monotonic()
+        return sum(now >= key.disabled_until for key in self.keys)
+
+    def _count(self, key: ApiKey, outcome: str):
+        key.usage[outcome] += 1
+        metrics.API_KEY_REQUESTS.inc(key=key.label, outcome=outcome)
+
+    def on_success(self, key: ApiKey):
+        self._count(key, "ok")
+        key.limiter.on_success()
+
+    def on_rate_limited(self, key: ApiKey, retry_after_seconds: Optional[float] = None):
+        self._count(key, "rate_limited")
+        pause = retry_after_seconds if retry_after_seconds is not None else self.quarantine_seconds
+        key.limiter.on_rate_limited(pause)
+        key.quarantined_until = max(key.quarantined_until, time.monotonic() + pause)
+        if len(self.keys) > 1:
+            logger.warning(f"API key {key.label} quarantined for {pause:.1f}s after a 429")
+
+    def on_forbidden(self, key: ApiKey):
+        self._count(key, "forbidden")
+        key.disabled_until = time.monotonic() + self.disable_seconds
+        logger.error(f"API key {key.label} disabled for {self.disable_seconds:.0f}s after a 403 (permission denied)")
+
+    def on_server_error(self, key: ApiKey):
+        self._count(key, "server_errors")
+        key.limiter.on_server_error()
+
+    def on_error(self, key: ApiKey):
+        self._count(key, "errors")
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        keys = [key.stats(now) for key in self.keys]
+        return {
+            "keys_total": len(keys),
+            "keys_active": sum(k["state"] == "active" for k in keys),
+            "keys_quarantined": sum(k["state"] == "quarantined" for k in keys),
+            "keys_disabled": sum(k["state"] == "disabled" for k in keys),
+            "keys": keys,
+        }
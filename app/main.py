@@ -1,41 +1,91 @@
+import asyncio
+import functools
+import json
 import pathlib
 import logging
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, Response, JSONResponse
-from fastapi.staticfiles import StaticFiles
+import time
+import uuid
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from .task_registry import TaskCancelledError, task_registry
+from .audio_encoding import EncoderBusyError
+from .job_queue import Job, JobManager, JobQueueFullError
+from .checkpoints import valid_job_id
+from .static_assets import CachedAsset, StaticAssets
+from . import metrics
 
 # Import from tts_client
 from .tts_client import (
     get_available_gemini_voices,
     synthesize_speech_with_gemini,
+    synthesize_speech_to_checkpoint,
+    stream_speech_with_gemini,
+    AUDIO_SAMPLE_RATE,
+    MIME_TYPES,
     DEFAULT_TEMPERATURE_CONFIG,
     DEFAULT_API_TIMEOUT_SECONDS_CONFIG,
     DEFAULT_VOICE_DISPLAY_NAME_CONFIG,
     DEFAULT_CHUNK_SIZE_CHARS_CONFIG,
-    APP_CONFIG
+    DEFAULT_CHUNK_CONCURRENCY_CONFIG,
+    MAX_CHUNK_CONCURRENCY_CONFIG,
+    APP_CONFIG,
+    resolve_chunk_concurrency,
+    chunk_cache,
+    checkpoint_store,
+    encoder_pool,
+    api_key_pool_stats,
+    hedger,
+    state_backend,
+    STATE_CANCEL_POLL_SECONDS_CONFIG,
+    start_http_client,
+    close_http_client
 )
 
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Opens shared resources on startup and releases them on shutdown."""
+    await start_http_client()
+    await job_manager.start()
+    cancellation_watcher = asyncio.create_task(
+        # Running tasks are interrupted by the registry itself; queued jobs only need removing from the queue
+        task_registry.watch_remote_cancellations(STATE_CANCEL_POLL_SECONDS_CONFIG, on_cancel=job_manager.cancel_queued)
+    )
+    yield
+    cancellation_watcher.cancel()
+    await asyncio.gather(cancellation_watcher, return_exceptions=True)
+    await job_manager.stop()
+    await close_http_client()
+    state_backend.close()
+
 app = FastAPI(
     title="Gemini TTS Server",
     description="FastAPI server for Google Gemini Text-to-Speech",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Define base path for templates and static files
 BASE_DIR = pathlib.Path(__file__).parent.resolve()
 
-# Mount static files (CSS, JS)
+# Static files (CSS, JS) are read, compressed and hashed once at startup and served from memory.
 # The path "static" here refers to a directory named "static" at the same level as this main.py file
 STATIC_DIR = BASE_DIR / "static"
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+static_assets = StaticAssets(STATIC_DIR, max_age_seconds=APP_CONFIG.get("static_cache_max_age_seconds", 31536000))
 
-class SynthesizeRequest(BaseModel):
-    task_id: str # Added: Unique ID for this synthesis task
+# index.html with versioned asset URLs; revalidated by ETag on each load
+INDEX_PAGE = static_assets.versioned_html("index.html")
+
+# Suggested client back-off when the encoder pool rejects work
+ENCODER_BUSY_RETRY_AFTER_SECONDS = 5
+
+BATCH_MAX_ITEMS_CONFIG = APP_CONFIG.get("batch_max_items", 500)
+
+class SynthesisParams(BaseModel):
     text: str
     voice_name: str
     audio_format: str 
@@ -43,87 +93,245 @@ class SynthesizeRequest(BaseModel):
     style_prompt: Optional[str] = None 
     chunk_size_chars: int 
     api_timeout_seconds: Optional[int] = DEFAULT_API_TIMEOUT_SECONDS_CONFIG
+    chunk_concurrency: Optional[int] = None # Parallel chunk requests; capped by max_chunk_concurrency
+
+class SynthesizeRequest(SynthesisParams):
+    task_id: str # Added: Unique ID for this synthesis task
+    stream: bool = False # Stream audio back as chunks complete instead of one buffered response
+
+class JobRequest(SynthesisParams):
+    priority: int = 0 # Higher runs first; equal priorities are shared fairly between clients
+    job_id: Optional[str] = None # Reuse the id of a failed/cancelled job to resume from its checkpoint
+
+class BatchItem(BaseModel):
+    text: str
+    voice_name: Optional[str] = None # Unset fields fall back to the batch-level values
+    audio_format: Optional[str] = None
+    style_prompt: Optional[str] = None
+    temperature: Optional[float] = None
+    id: Optional[str] = None # Caller's reference, echoed back in the results
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    voice_name: str = DEFAULT_VOICE_DISPLAY_NAME_CONFIG
+    audio_format: str = APP_CONFIG.get("default_audio_format", "wav")
+    style_prompt: Optional[str] = None
+    temperature: float = DEFAULT_TEMPERATURE_CONFIG
+    chunk_size_chars: int = DEFAULT_CHUNK_SIZE_CHARS_CONFIG
+    api_timeout_seconds: Optional[int] = DEFAULT_API_TIMEOUT_SECONDS_CONFIG
+    chunk_concurrency: Optional[int] = None # One pool shared by the chunks of all items
+
+def _validate_synthesis_params(params: SynthesisParams):
+    if not params.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty.")
+    if not params.voice_name:
+        raise HTTPException(status_code=400, detail="Voice name must be provided.")
+    if params.audio_format.lower() not in ["mp3", "wav", "flac"]:
+        raise HTTPException(status_code=400, detail="Invalid audio format. Must be 'mp3', 'wav', or 'flac'.")
+
+def _compose_text(params: SynthesisParams) -> str:
+    """Prepends the style prompt, if any, to the main text."""
+    if params.style_prompt and params.style_prompt.strip():
+        logger.info(f"Using style prompt: '{params.style_prompt.strip()}'")
+        return f"{params.style_prompt.strip()} {params.text}"
+    return params.text
+
+def _client_id(request: Request) -> str:
+    """Identifies the caller for job fairness: X-Client-Id header, else the remote address."""
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "anonymous")
+
+async def _run_synthesis_job(job: Job, chunk_slots: Optional[asyncio.Semaphore] = None, checkpoint: bool = True):
+    params = SynthesisParams(**job.params)
+    if checkpoint and checkpoint_store.enabled:
+        return await synthesize_speech_to_checkpoint(
+            checkpoint_id=job.id,
+            text=_compose_text(params),
+            voice_display_name=params.voice_name,
+            audio_format=params.audio_format.lower(),
+            temperature=params.temperature,
+            chunk_size_chars=params.chunk_size_chars,
+            api_timeout_seconds=params.api_timeout_seconds,
+            task_id=job.id,
+            chunk_concurrency=params.chunk_concurrency,
+            on_progress=job.set_progress
+        )
+    return await synthesize_speech_with_gemini(
+        text=_compose_text(params),
+        voice_display_name=params.voice_name,
+        audio_format=params.audio_format.lower(),
+        temperature=params.temperature,
+        chunk_size_chars=params.chunk_size_chars,
+        api_timeout_seconds=params.api_timeout_seconds,
+        task_id=job.id,
+        chunk_concurrency=params.chunk_concurrency,
+        on_progress=job.set_progress,
+        chunk_slots=chunk_slots
+    )
+
+job_manager = JobManager(
+    runner=_run_synthesis_job,
+    max_workers=APP_CONFIG.get("job_max_workers", 4),
+    max_queue=APP_CONFIG.get("job_max_queue", 32),
+    result_ttl_seconds=APP_CONFIG.get("job_result_ttl_seconds", 3600),
+    retry_after_seconds=APP_CONFIG.get("job_retry_after_seconds", 10),
+    state_backend=state_backend,
+)
+
+def _busy_response(e: JobQueueFullError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+# --- Metrics ---
+def _numeric_stats(stats: dict) -> dict:
+    """Keeps the numeric entries of a component's stats() dict (booleans become 0/1)."""
+    return {k: float(v) for k, v in stats.items() if isinstance(v, (int, float))}
+
+metrics.Gauge("tts_task_registry_size", "Task ids currently registered for cancellation.", callback=lambda: len(task_registry.tasks))
+metrics.Gauge("tts_chunk_cache", "Chunk audio cache statistics.", ("stat",), callback=lambda: _numeric_stats(chunk_cache.stats()))
+metrics.Gauge("tts_encoder_pool", "Encoder pool statistics.", ("stat",), callback=lambda: _numeric_stats(encoder_pool.stats()))
+metrics.Gauge("tts_api_keys", "Gemini API keys by state (active, quarantined, disabled).", ("state",), callback=lambda: {
+    state: api_key_pool_stats()[f"keys_{state}"] for state in ("active", "quarantined", "disabled")
+})
+metrics.Gauge("tts_api_key_rate_fraction", "Adaptive rate of each API key as a fraction of its budget.", ("key",), callback=lambda: {
+    key["label"]: key["rate_limiter"]["rate_fraction"] for key in api_key_pool_stats()["keys"]
+})
+metrics.Gauge("tts_hedging", "Hedged request state and counters.", ("stat",), callback=lambda: _numeric_stats(hedger.stats()))
+metrics.Gauge("tts_job_queue", "Job queue and synthesis slot statistics.", ("stat",), callback=lambda: _numeric_stats(job_manager.stats()))
+metrics.Gauge("tts_jobs", "Retained jobs by status.", ("status",), callback=lambda: job_manager.stats()["jobs_by_status"])
+
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """Collects per-stage timings for each request and reports them in a Server-Timing header."""
+    token = metrics.start_request_timing()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        # For streamed audio the header covers everything up to the first piece
+        response.headers["Server-Timing"] = metrics.server_timing_header(time.perf_counter() - started)
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=getattr(route, "path", "unmatched"), method=request.method, status=status
+        )
+        metrics.stop_request_timing(token)
 
 @app.post("/api/cancel_task/{task_id}")
 async def cancel_task(task_id: str):
     """Handles task cancellation requests."""
     logger.info(f"Received cancellation request for task_id: {task_id}")
     try:
-        task_registry.cancel(task_id)
+        await task_registry.cancel(task_id)
         return {"message": "Cancellation request processed", "task_id": task_id}
     except Exception as e:
         logger.error(f"Error cancelling task {task_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to process cancellation request.")
 
 @app.get("/", response_class=HTMLResponse)
-async def get_index():
+async def get_index(request: Request):
     """Serves the main HTML page."""
-    return HTMLResponse(content=open(STATIC_DIR / "index.html").read())
+    return INDEX_PAGE.response(request.headers)
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_static(path: str, request: Request):
+    """Serves a static file from memory (precompressed, ETag'd; cached long-term when requested by versioned URL)."""
+    response = static_assets.response(path, request.headers, request.query_params.get("v"))
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
+
+# Frontend configuration; fixed for the life of the process, so built once
+CONFIG_PAYLOAD = CachedAsset.from_json({
+    "default_theme": APP_CONFIG.get("default_theme", "dark"),
+    "default_style_prompt": APP_CONFIG.get("default_style_prompt", "Read aloud in a warm and friendly tone:"),
+    "default_audio_format": APP_CONFIG.get("default_audio_format", "wav"),
+    "default_temperature": APP_CONFIG.get("default_temperature", 1.0),
+    "default_chunk_size_chars": APP_CONFIG.get("default_chunk_size_chars", 1500),
+    "default_api_timeout_seconds": APP_CONFIG.get("default_api_timeout_seconds", 60),
+    "default_voice_display_name": APP_CONFIG.get("default_voice_display_name", "Fenrir"),
+    "default_max_text_chars": APP_CONFIG.get("default_max_text_chars", 20000),
+    "default_chunk_concurrency": DEFAULT_CHUNK_CONCURRENCY_CONFIG,
+    "max_chunk_concurrency": MAX_CHUNK_CONCURRENCY_CONFIG,
+    "default_stream_playback": APP_CONFIG.get("default_stream_playback", False),
+    # Add more as needed
+})
 
 @app.get("/api/config")
-async def get_config():
+async def get_config(request: Request):
     """
     Returns selected configuration values for the frontend.
     """
-    return JSONResponse({
-        "default_theme": APP_CONFIG.get("default_theme", "dark"),
-        "default_style_prompt": APP_CONFIG.get("default_style_prompt", "Read aloud in a warm and friendly tone:"),
-        "default_audio_format": APP_CONFIG.get("default_audio_format", "wav"),
-        "default_temperature": APP_CONFIG.get("default_temperature", 1.0),
-        "default_chunk_size_chars": APP_CONFIG.get("default_chunk_size_chars", 1500),
-        "default_api_timeout_seconds": APP_CONFIG.get("default_api_timeout_seconds", 60),
-        "default_voice_display_name": APP_CONFIG.get("default_voice_display_name", "Fenrir"),
-        "default_max_text_chars": APP_CONFIG.get("default_max_text_chars", 20000),
-        # Add more as needed
-    })
+    return CONFIG_PAYLOAD.response(request.headers)
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Returns hit/miss/eviction counters for the chunk audio cache."""
+    return chunk_cache.stats()
+
+@app.post("/api/cache/clear")
+async def clear_cache():
+    """Drops the in-memory tier of the chunk audio cache."""
+    chunk_cache.clear()
+    return {"message": "Chunk cache cleared", "stats": chunk_cache.stats()}
+
+@app.get("/api/encoder/stats")
+async def get_encoder_stats():
+    """Returns size, backlog and counters of the MP3/FLAC encoder pool."""
+    return encoder_pool.stats()
+
+@app.get("/api/rate_limit/stats")
+async def get_rate_limit_stats():
+    """Returns per-key usage, health and rate limiter state, plus hedging counters."""
+    return {**api_key_pool_stats(), "hedging": hedger.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of latency histograms, counters and gauges."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Built once: the voice list is fixed
+_VOICES = get_available_gemini_voices()
+VOICES_PAYLOAD = CachedAsset.from_json({"voices": _VOICES, "default_voice": DEFAULT_VOICE_DISPLAY_NAME_CONFIG}) if _VOICES else None
 
 @app.get("/api/voices")
-async def list_voices_endpoint():
+async def list_voices_endpoint(request: Request):
     """Lists all available Google TTS voices."""
-    try:
-        voices = get_available_gemini_voices()
-        if not voices:
-            raise HTTPException(status_code=404, detail="No voices found or error fetching voices.")
-        return {
-            "voices": voices,
-            "default_voice": DEFAULT_VOICE_DISPLAY_NAME_CONFIG
-        }
-    except Exception as e:
-        logger.error(f"Error in /api/voices: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal server error fetching voices: {str(e)}")
+    if VOICES_PAYLOAD is None:
+        raise HTTPException(status_code=404, detail="No voices found or error fetching voices.")
+    return VOICES_PAYLOAD.response(request.headers)
 
 @app.post("/api/synthesize")
 async def synthesize_speech_endpoint(request_data: SynthesizeRequest):
     """Synthesizes text to speech and returns audio stream."""
-    if not request_data.text.strip():
-        raise HTTPException(status_code=400, detail="Text cannot be empty.")
+    _validate_synthesis_params(request_data)
 
     # Register task with cancellation system
     if request_data.task_id:
-        task_registry.register(request_data.task_id)
-    if not request_data.voice_name:
-        raise HTTPException(status_code=400, detail="Voice name must be provided.")
-    
-    if request_data.audio_format.lower() not in ["mp3", "wav", "flac"]:
-        raise HTTPException(status_code=400, detail="Invalid audio format. Must be 'mp3', 'wav', or 'flac'.")
+        await task_registry.register(request_data.task_id)
+    streaming_started = False
 
     try:
-        final_text_to_synthesize = request_data.text
-        if request_data.style_prompt and request_data.style_prompt.strip():
-            # Prepend style prompt to the main text
-            final_text_to_synthesize = f"{request_data.style_prompt.strip()} {request_data.text}"
-            logger.info(f"Using style prompt: '{request_data.style_prompt.strip()}'")
+        final_text_to_synthesize = _compose_text(request_data)
         
-        logger.info(f"Synthesize request: Combined Text='{final_text_to_synthesize[:100]}...', Voice='{request_data.voice_name}', Format='{request_data.audio_format}', Temp='{request_data.temperature}'")
-        audio_content, mime_type = synthesize_speech_with_gemini(
-            text=final_text_to_synthesize,
-            voice_display_name=request_data.voice_name,
-            audio_format=request_data.audio_format.lower(),
-            temperature=request_data.temperature,
-            chunk_size_chars=request_data.chunk_size_chars,
-            api_timeout_seconds=request_data.api_timeout_seconds,
-            task_id=request_data.task_id
-        )
+        logger.info(f"Synthesize request: Combined Text='{final_text_to_synthesize[:100]}...', Voice='{request_data.voice_name}', Format='{request_data.audio_format}', Temp='{request_data.temperature}', Stream={request_data.stream}")
+        if request_data.stream:
+            response = await _start_streaming_response(request_data, final_text_to_synthesize)
+            streaming_started = True
+            return response
+
+        async with job_manager.slot():
+            audio_content, mime_type = await synthesize_speech_with_gemini(
+                text=final_text_to_synthesize,
+                voice_display_name=request_data.voice_name,
+                audio_format=request_data.audio_format.lower(),
+                temperature=request_data.temperature,
+                chunk_size_chars=request_data.chunk_size_chars,
+                api_timeout_seconds=request_data.api_timeout_seconds,
+                task_id=request_data.task_id,
+                chunk_concurrency=request_data.chunk_concurrency
+            )
 
         if audio_content is None and not task_registry.is_cancelled(request_data.task_id):
             logger.warning("Synthesis resulted in no audio content")
@@ -145,6 +353,14 @@ async def synthesize_speech_endpoint(request_data: SynthesizeRequest):
     except TaskCancelledError as e:
         logger.info(f"Task cancellation processed: {str(e)}")
         raise HTTPException(status_code=499, detail=str(e))
+
+    except EncoderBusyError as e:
+        logger.warning(f"Rejecting synthesis, encoder pool saturated: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(ENCODER_BUSY_RETRY_AFTER_SECONDS)})
+
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting synthesis: {e}")
+        raise _busy_response(e)
         
     except Exception as e:
         logger.error(f"Error in /api/synthesize: {e}")
@@ -153,7 +369,259 @@ async def synthesize_speech_endpoint(request_data: SynthesizeRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
         
     finally:
-        # Ensure task is unregistered
+        # Ensure task is unregistered (a streaming response unregisters when its body finishes)
+        if request_data.task_id and not streaming_started:
+            task_registry.unregister(request_data.task_id)
+
+class _ReleasingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that runs `on_close` once it is over, however it ends.
+    Work started before the response is returned (a held synthesis slot, a
+    running producer) is released even if the client disconnects before the
+    body starts, when the body generator's own cleanup would never run.
+    """
+    def __init__(self, content, on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            await self.on_close()
+
+async def _start_streaming_response(request_data: SynthesizeRequest, text: str) -> StreamingResponse:
+    """
+    Starts streaming synthesis and waits for the first piece of audio before
+    returning, so failures on the first chunk still produce a proper HTTP error.
+    """
+    audio_format = request_data.audio_format.lower()
+    # The synthesis slot is held until the stream finishes, not just until headers are sent
+    slot = AsyncExitStack()
+    await slot.enter_async_context(job_manager.slot())
+    audio_stream = stream_speech_with_gemini(
+        text=text,
+        voice_display_name=request_data.voice_name,
+        audio_format=audio_format,
+        temperature=request_data.temperature,
+        chunk_size_chars=request_data.chunk_size_chars,
+        api_timeout_seconds=request_data.api_timeout_seconds,
+        task_id=request_data.task_id,
+        chunk_concurrency=request_data.chunk_concurrency
+    )
+    try:
+        first_piece = await audio_stream.__anext__()
+    except StopAsyncIteration:
+        await slot.aclose()
+        raise HTTPException(status_code=500, detail="Speech synthesis failed to produce audio.")
+    except BaseException:
+        await slot.aclose()
+        raise
+
+    async def body():
+        try:
+            yield first_piece
+            async for piece in audio_stream:
+                yield piece
+        except TaskCancelledError as e:
+            # Cancelled on request: end the body cleanly, the client asked for it to stop
+            logger.info(f"Streaming synthesis cancelled: {e}")
+        except Exception as e:
+            # Headers are already sent; re-raise so the connection is dropped and the client sees a broken stream
+            logger.error(f"Streaming synthesis aborted mid-stream: {e}")
+            raise
+
+    async def release():
+        await audio_stream.aclose()
+        await slot.aclose()
         if request_data.task_id:
             task_registry.unregister(request_data.task_id)
 
+    mime_type = MIME_TYPES[audio_format]
+    headers = {
+        'Content-Disposition': 'inline',
+        'Cache-Control': 'no-cache',
+        'X-Audio-Sample-Rate': str(AUDIO_SAMPLE_RATE),
+        'X-Audio-Channels': '1',
+        'Access-Control-Expose-Headers': 'Content-Disposition, X-Audio-Sample-Rate, X-Audio-Channels'
+    }
+    return _ReleasingStreamingResponse(body(), on_close=release, media_type=mime_type, headers=headers)
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request_data: JobRequest, request: Request):
+    """Queues a synthesis job and returns its id immediately."""
+    _validate_synthesis_params(request_data)
+    job_id = request_data.job_id or str(uuid.uuid4())
+    if not valid_job_id(job_id):
+        raise HTTPException(status_code=400, detail="job_id may only contain letters, digits, '-' and '_' (max 64).")
+    await _ensure_job_not_active(job_id)
+    params = request_data.model_dump(exclude={"priority", "job_id"})
+    job = await _submit_job(job_id, params, request_data.priority, request)
+    if checkpoint_store.enabled:
+        # Kept next to the chunk checkpoints so the job can be resumed after it is gone from memory.
+        # Written only once the job is admitted, so a rejected submission leaves nothing to resume.
+        await asyncio.to_thread(checkpoint_store.write_params, job_id, {**params, "priority": request_data.priority})
+    return job
+
+async def _ensure_job_not_active(job_id: str):
+    current = await job_manager.describe(job_id)
+    if current is not None and current["status"] in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already {current['status']}.")
+
+async def _submit_job(job_id: str, params: Dict, priority: int, request: Request) -> Dict:
+    try:
+        job = await job_manager.submit(params=params, client_id=_client_id(request), priority=priority, job_id=job_id)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting job: {e}")
+        raise _busy_response(e)
+    return job.to_dict()
+
+@app.post("/api/jobs/{job_id}/resume", status_code=202)
+async def resume_job(job_id: str, request: Request):
+    """Re-queues a failed or cancelled job; chunks saved in its checkpoint are not synthesized again."""
+    params = await asyncio.to_thread(checkpoint_store.read_params, job_id) if checkpoint_store.enabled and valid_job_id(job_id) else None
+    if params is None:
+        raise HTTPException(status_code=404, detail="No checkpoint found for this job.")
+    await _ensure_job_not_active(job_id)
+    priority = params.pop("priority", 0)
+    logger.info(f"Resuming job {job_id}")
+    return await _submit_job(job_id, params, priority, request)
+
+@app.get("/api/jobs")
+async def get_job_queue_stats():
+    """Returns worker, queue and per-status job counts."""
+    return job_manager.stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Returns status and progress (chunks done/total) of a job."""
+    job = await job_manager.describe(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/api/jobs/{job_id}/audio")
+async def get_job_audio(job_id: str):
+    """Returns the synthesized audio of a completed job."""
+    job = await job_manager.describe(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    result = await job_manager.get_result(job_id) if job["status"] == "completed" else None
+    if result is None and job["status"] == "completed":
+        # Checkpointed output written by another worker on this host
+        output = await asyncio.to_thread(checkpoint_store.find_output, job_id, job["audio_format"])
+        result = (output, job["mime_type"]) if output is not None else None
+    if result is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, audio not available.")
+    audio, mime_type = result
+    headers = {
+        'Content-Disposition': f'attachment; filename="{job_id}.{job["audio_format"].lower()}"',
+        'Cache-Control': 'no-cache',
+        'Access-Control-Expose-Headers': 'Content-Disposition'
+    }
+    if isinstance(audio, pathlib.Path):
+        return FileResponse(audio, media_type=mime_type, headers=headers)
+    return Response(content=audio, media_type=mime_type, headers=headers)
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancels a queued or running job, whichever worker process runs it."""
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.post("/api/synthesize_batch")
+async def synthesize_batch_endpoint(request_data: BatchRequest, request: Request):
+    """
+    Synthesizes many short items in one call. Identical items are synthesized
+    once, and the chunks of all items share one concurrency pool. Results are
+    streamed as NDJSON, one line per unique item as it finishes, each with the
+    job id and audio URL (served by GET /api/jobs/{job_id}/audio).
+    """
+    if not request_data.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one item.")
+    if len(request_data.items) > BATCH_MAX_ITEMS_CONFIG:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(request_data.items)} items (max {BATCH_MAX_ITEMS_CONFIG}).")
+
+    groups: Dict[Tuple, List[int]] = {}
+    params_by_key: Dict[Tuple, SynthesisParams] = {}
+    for index, item in enumerate(request_data.items):
+        params = SynthesisParams(
+            text=item.text,
+            voice_name=item.voice_name or request_data.voice_name,
+            audio_format=(item.audio_format or request_data.audio_format).lower(),
+            temperature=item.temperature if item.temperature is not None else request_data.temperature,
+            style_prompt=item.style_prompt if item.style_prompt is not None else request_data.style_prompt,
+            chunk_size_chars=request_data.chunk_size_chars,
+            api_timeout_seconds=request_data.api_timeout_seconds,
+        )
+        try:
+            _validate_synthesis_params(params)
+        except HTTPException as e:
+            raise HTTPException(status_code=400, detail=f"Item {index}: {e.detail}")
+        key = (_compose_text(params), params.voice_name, params.audio_format, params.temperature)
+        groups.setdefault(key, []).append(index)
+        params_by_key.setdefault(key, params)
+
+    # The whole batch occupies one synthesis slot until its last item finishes
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(job_manager.slot())
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting batch: {e}")
+        raise _busy_response(e)
+    client_id = _client_id(request)
+    jobs = {key: await job_manager.track(params.model_dump(), client_id) for key, params in params_by_key.items()}
+    concurrency = resolve_chunk_concurrency(request_data.chunk_concurrency)
+    logger.info(f"Batch of {len(request_data.items)} items ({len(jobs)} unique) from {client_id}, chunk concurrency {concurrency}")
+    tasks: List[asyncio.Task] = []
+    return _ReleasingStreamingResponse(
+        _stream_batch_results(request_data, groups, jobs, concurrency, tasks),
+        on_close=functools.partial(_finish_batch, jobs, tasks, slot),
+        media_type="application/x-ndjson",
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+async def _finish_batch(jobs: Dict[Tuple, Job], tasks: List[asyncio.Task], slot: AsyncExitStack):
+    """Cancels what is left of a batch whose client went away (or whose stream failed) and frees its slot."""
+    for job in jobs.values():
+        if not job.finished:
+            await job_manager.cancel(job.id)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for job in jobs.values():
+        if not job.finished:
+            # Never started: running it now just records the cancellation and unregisters it
+            await job_manager.run_tracked(job)
+    await slot.aclose()
+
+async def _stream_batch_results(request_data: BatchRequest, groups: Dict[Tuple, List[int]], jobs: Dict[Tuple, Job], concurrency: int, tasks: List[asyncio.Task]):
+    chunk_slots = asyncio.Semaphore(concurrency)
+    # Items beyond the chunk pool size would only sit on buffered PCM, so cap them too
+    item_slots = asyncio.Semaphore(concurrency)
+    runner = functools.partial(_run_synthesis_job, chunk_slots=chunk_slots, checkpoint=False)
+
+    async def run_item(key: Tuple) -> Tuple:
+        async with item_slots:
+            await job_manager.run_tracked(jobs[key], runner)
+        return key
+
+    def line(payload: Dict) -> bytes:
+        return (json.dumps(payload) + "\n").encode()
+
+    def item_refs(key: Tuple) -> Dict:
+        indexes = groups[key]
+        return {"indexes": indexes, "ids": [request_data.items[i].id for i in indexes]}
+
+    tasks.extend(asyncio.create_task(run_item(key)) for key in jobs)
+    # Job ids up front, so callers can cancel individual items with DELETE /api/jobs/{job_id}
+    yield line({"type": "accepted", "items": len(request_data.items), "unique_items": len(jobs),
+                "jobs": [{**item_refs(key), "job_id": job.id} for key, job in jobs.items()]})
+    for finished in asyncio.as_completed(tasks):
+        key = await finished
+        yield line({"type": "item", **item_refs(key), **jobs[key].to_dict()})
+    statuses = [job.status for job in jobs.values()]
+    yield line({"type": "summary", "items": len(request_data.items), "unique_items": len(jobs),
+                **{status: statuses.count(status) for status in ("completed", "failed", "cancelled")}})
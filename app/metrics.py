@@ -0,0 +1,195 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# --- Prometheus-style metric primitives ---
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in self._values.items()]
+
+class Gauge(_Metric):
+    """A settable gauge, or a callback gauge when `callback` is given (returns a number or {label value: number})."""
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            if isinstance(value, dict):
+                return [f"{self.name}{_format_labels(self.labelnames, (k,))} {_format_value(v)}" for k, v in value.items()]
+            return [f"{self.name} {_format_value(value)}"]
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in self._values.items()]
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+registry = MetricsRegistry()
+
+# --- Per-request Server-Timing ---
+
+_request_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_timings", default=None)
+
+def start_request_timing():
+    """Starts collecting stage timings for the current request; returns a token for reset."""
+    return _request_timings.set({})
+
+def stop_request_timing(token):
+    _request_timings.reset(token)
+
+def record_stage(stage: str, seconds: float):
+    """Adds `seconds` to the named stage of the current request (no-op outside a request)."""
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+def server_timing_header(total_seconds: Optional[float] = None) -> str:
+    timings = _request_timings.get() or {}
+    parts = []
+    for stage, (seconds, count) in timings.items():
+        desc = f';desc="{count}x"' if count > 1 else ""
+        parts.append(f"{stage};dur={seconds * 1000:.1f}{desc}")
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+@contextmanager
+def timed(histogram: Optional[Histogram], stage: Optional[str] = None, **labels):
+    """Times the block into `histogram` (with labels) and the request's Server-Timing `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+        if stage:
+            record_stage(stage, elapsed)
+
+# --- Instruments ---
+
+TEXT_SPLIT_SECONDS = Histogram("tts_text_split_seconds", "Time spent splitting input text into chunks.")
+TEXT_CHUNKS = Histogram("tts_text_chunks", "Number of chunks per synthesis task.", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+GEMINI_REQUEST_SECONDS = Histogram("tts_gemini_request_seconds", "Latency of individual Gemini generateContent calls.", ("status", "attempt"))
+GEMINI_RETRIES = Counter("tts_gemini_retries_total", "Gemini call retries, by reason.", ("reason",))
+API_KEY_REQUESTS = Counter("tts_api_key_requests_total", "Gemini call outcomes per API key (ok, rate_limited, forbidden, server_errors, errors).", ("key", "outcome"))
+CHUNK_CACHE_LOOKUPS = Counter("tts_chunk_cache_lookups_total", "Chunk cache lookups, by result.", ("result",))
+PCM_ASSEMBLY_SECONDS = Histogram("tts_pcm_assembly_seconds", "Time spent assembling chunk PCM into the final buffer.")
+POSTPROCESS_CPU_MS_PER_AUDIO_SECOND = Histogram("tts_postprocess_cpu_ms_per_audio_second", "CPU milliseconds spent post-processing each second of chunk audio.", buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100))
+ENCODE_SECONDS = Histogram("tts_encode_seconds", "Time spent encoding audio, by format.", ("format",))
+RESPONSE_SIZE_BYTES = Histogram("tts_response_size_bytes", "Size of synthesized audio responses.", ("format", "mode"), buckets=SIZE_BUCKETS)
+SYNTHESIS_SECONDS = Histogram("tts_synthesis_seconds", "End-to-end synthesis time, by format and outcome.", ("format", "outcome"))
+HEDGED_REQUESTS = Counter("tts_hedged_requests_total", "Chunk requests that were slow enough to hedge, by outcome (won, lost, failed, no_budget).", ("outcome",))
+HEDGE_DELAY_SECONDS = Histogram("tts_hedge_delay_seconds", "Delay after which a chunk request was hedged.")
+TASKS_IN_FLIGHT = Gauge("tts_tasks_in_flight", "Synthesis tasks currently running.")
+HTTP_REQUEST_SECONDS = Histogram("tts_http_request_seconds", "Time to produce HTTP responses (until headers), by route and status.", ("route", "method", "status"))
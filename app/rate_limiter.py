@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised while the circuit breaker is open after sustained upstream 5xx errors."""
+    pass
+
+class TokenBucket:
+    """Classic token bucket; `capacity` tokens refill at `rate` tokens per second."""
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+class AdaptiveRateLimiter:
+    """
+    Limiter for one API key's quota, shared by every chunk request sent with that key.
+
+    Requests wait for both a request token and enough character tokens. A 429
+    halves the effective rate (down to `min_rate_fraction`) and pauses all
+    callers for the server's Retry-After; each success ramps the rate back up.
+    `breaker_threshold` consecutive 5xx responses open a circuit breaker that
+    fails calls fast for `breaker_cooldown_seconds`, after which one trial
+    request is let through; its outcome closes or re-opens the breaker.
+    """
+    def __init__(
+        self, requests_per_minute: float, chars_per_minute: float,
+        min_rate_fraction: float = 0.1, recovery_step: float = 0.05,
+        default_retry_after_seconds: float = 5.0,
+        breaker_threshold: int = 5, breaker_cooldown_seconds: float = 30.0
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.chars_per_minute = chars_per_minute
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_step = recovery_step
+        self.default_retry_after_seconds = default_retry_after_seconds
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown_seconds = breaker_cooldown_seconds
+        self.rate_fraction = 1.0
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self._chars = TokenBucket(chars_per_minute, chars_per_minute / 60.0)
+        self._paused_until = 0.0
+        self._consecutive_server_errors = 0
+        self._breaker_open_until = 0.0
+        self._breaker_trial_at = 0.0
+        self._lock = asyncio.Lock()
+        self._stats = {"acquired": 0, "rate_limited": 0, "server_errors": 0, "breaker_trips": 0, "breaker_rejections": 0, "wait_seconds_total": 0.0}
+
+    def _apply_rate(self):
+        self._requests.rate = self.requests_per_minute / 60.0 * self.rate_fraction
+        self._chars.rate = self.chars_per_minute / 60.0 * self.rate_fraction
+
+    def _check_breaker(self, now: float):
+        if self._breaker_open_until == 0.0:
+            return
+        trial_pending = self._breaker_trial_at and now - self._breaker_trial_at < self.breaker_cooldown_seconds
+        if now < self._breaker_open_until or trial_pending:
+            self._stats["breaker_rejections"] += 1
+            raise CircuitOpenError(f"Gemini API circuit breaker open after {self._consecutive_server_errors} consecutive server errors.")
+
+    def _start_breaker_trial(self, now: float):
+        # Half-open: the request that gets through now is the single trial
+        if self._breaker_open_until and now >= self._breaker_open_until:
+            self._breaker_trial_at = now
+
+    def estimate_wait(self, chars: int) -> float:
+        """Seconds until a request carrying `chars` characters could be sent, ignoring other waiters (inf while the breaker is open)."""
+        now = time.monotonic()
+        if self._breaker_open_until and now < self._breaker_open_until:
+            return float("inf")
+        return max(0.0, self._paused_until - now, self._requests.wait_time(1, now), self._chars.wait_time(chars, now))
+
+    @property
+    def request_rate(self) -> float:
+        """Current request rate (per second) after adaptive backoff."""
+        return self._requests.rate
+
+    @property
+    def quota_fraction(self) -> float:
+        """Share of the request or character budget (whichever is lower) currently available."""
+        now = time.monotonic()
+        fractions = []
+        for bucket in (self._requests, self._chars):
+            bucket._refill(now)
+            fractions.append(bucket.tokens / bucket.capacity if bucket.capacity else 0.0)
+        return min(fractions)
+
+    async def acquire(self, chars: int, poll_interval: float = 0.25):
+        """
+        Waits until one request carrying `chars` characters may be sent.
+        Waiters are served in FIFO order; the wait is re-evaluated at least
+        every `poll_interval` seconds as the rate adapts.
+        """
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._check_breaker(now)
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.wait_time(1, now),
+                    self._chars.wait_time(chars, now),
+                )
+                if wait <= 0:
+                    self._start_breaker_trial(now)
+                    self._requests.take(1)
+                    self._chars.take(chars)
+                    break
+                await asyncio.sleep(min(wait, poll_interval))
+        self._stats["acquired"] += 1
+        self._stats["wait_seconds_total"] += time.monotonic() - started
+
+    def on_success(self):
+        self._consecutive_server_errors = 0
+        self._breaker_open_until = 0.0
+        self._breaker_trial_at = 0.0
+        if self.rate_fraction < 1.0:
+            self.rate_fraction = min(1.0, self.rate_fraction + self.recovery_step)
+            self._apply_rate()
+
+    def on_rate_limited(self, retry_after_seconds: Optional[float] = None):
+        self._stats["rate_limited"] += 1
+        self._breaker_trial_at = 0.0
+        pause = retry_after_seconds if retry_after_seconds is not None else self.default_retry_after_seconds
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        self.rate_fraction = max(self.min_rate_fraction, self.rate_fraction / 2)
+        self._apply_rate()
+        logger.warning(f"Rate limited by Gemini: pausing {pause:.1f}s, rate now {self.rate_fraction:.0%} of budget")
+
+    def on_server_error(self):
+        self._stats["server_errors"] += 1
+        self._consecutive_server_errors += 1
+        self._breaker_trial_at = 0.0
+        if self._consecutive_server_errors >= self.breaker_threshold:
+            if self._breaker_open_until <= time.monotonic():
+                self._stats["breaker_trips"] += 1
+                logger.error(f"Opening Gemini circuit breaker for {self.breaker_cooldown_seconds}s after {self._consecutive_server_errors} consecutive server errors")
+            self._breaker_open_until = time.monotonic() + self.breaker_cooldown_seconds
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        self._requests._refill(now)
+        self._chars._refill(now)
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "chars_per_minute": self.chars_per_minute,
+            "rate_fraction": round(self.rate_fraction, 3),
+            "request_tokens": round(self._requests.tokens, 2),
+            "char_tokens": round(self._chars.tokens, 1),
+            "paused_for_seconds": round(max(0.0, self._paused_until - now), 2),
+            "breaker_open": now < self._breaker_open_until,
+            "consecutive_server_errors": self._consecutive_server_errors,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self._stats.items()},
+        }
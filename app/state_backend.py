@@ -0,0 +1,279 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class StateBackend(ABC):
+    """
+    Where cancellation flags, job snapshots and job results live, so that any
+    worker process (or host) can answer for a task started by another one.
+
+    `shared` is False for backends only this process can see; callers skip
+    the extra writes in that case and rely on their in-process state.
+    """
+    shared = True
+
+    @abstractmethod
+    def set_cancelled(self, task_id: str, ttl_seconds: float):
+        ...
+
+    @abstractmethod
+    def clear_cancelled(self, task_id: str):
+        ...
+
+    @abstractmethod
+    def cancelled_among(self, task_ids: Iterable[str]) -> Set[str]:
+        """Returns the subset of `task_ids` that have been flagged as cancelled."""
+
+    @abstractmethod
+    def put_job(self, job_id: str, snapshot: Dict, ttl_seconds: float):
+        ...
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def put_result(self, job_id: str, audio: bytes, mime_type: str, ttl_seconds: float):
+        ...
+
+    @abstractmethod
+    def get_result(self, job_id: str) -> Optional[Tuple[bytes, str]]:
+        ...
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {"backend": type(self).__name__, "shared": self.shared}
+
+class MemoryStateBackend(StateBackend):
+    """Process-local state. Only correct with a single worker process."""
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, str], Tuple[object, float]] = {}
+
+    def _set(self, kind: str, key: str, value, ttl_seconds: float):
+        with self._lock:
+            self._values[(kind, key)] = (value, time.time() + ttl_seconds)
+
+    def _get(self, kind: str, key: str):
+        with self._lock:
+            item = self._values.get((kind, key))
+            if item is None:
+                return None
+            if item[1] < time.time():
+                del self._values[(kind, key)]
+                return None
+            return item[0]
+
+    def set_cancelled(self, task_id, ttl_seconds):
+        self._set("cancel", task_id, True, ttl_seconds)
+
+    def clear_cancelled(self, task_id):
+        with self._lock:
+            self._values.pop(("cancel", task_id), None)
+
+    def cancelled_among(self, task_ids):
+        return {task_id for task_id in task_ids if self._get("cancel", task_id)}
+
+    def put_job(self, job_id, snapshot, ttl_seconds):
+        self._set("job", job_id, dict(snapshot), ttl_seconds)
+
+    def get_job(self, job_id):
+        return self._get("job", job_id)
+
+    def put_result(self, job_id, audio, mime_type, ttl_seconds):
+        self._set("result", job_id, (audio, mime_type), ttl_seconds)
+
+    def get_result(self, job_id):
+        return self._get("result", job_id)
+
+class SQLiteStateBackend(StateBackend):
+    """State in a SQLite file, shared by the worker processes of one host (WAL mode)."""
+    # Expired rows are purged at most this often
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        import sqlite3  # only needed by this backend
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cancellations (task_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, snapshot TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (job_id TEXT PRIMARY KEY, mime_type TEXT NOT NULL, audio BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._last_purge = 0.0
+        logger.info(f"Using SQLite state backend at {path}")
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        for table in ("cancellations", "jobs", "results"):
+            self._execute(f"DELETE FROM {table} WHERE expires_at < ?", (now,))
+
+    def set_cancelled(self, task_id, ttl_seconds):
+        self._execute("INSERT OR REPLACE INTO cancellations VALUES (?, ?)", (task_id, time.time() + ttl_seconds))
+        self._purge_expired()
+
+    def clear_cancelled(self, task_id):
+        self._execute("DELETE FROM cancellations WHERE task_id = ?", (task_id,))
+
+    def cancelled_among(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return set()
+        placeholders = ",".join("?" * len(task_ids))
+        rows = self._execute(
+            f"SELECT task_id FROM cancellations WHERE expires_at >= ? AND task_id IN ({placeholders})",
+            (time.time(), *task_ids),
+        )
+        return {row[0] for row in rows}
+
+    def put_job(self, job_id, snapshot, ttl_seconds):
+        self._execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)", (job_id, json.dumps(snapshot), time.time() + ttl_seconds))
+        self._purge_expired()
+
+    def get_job(self, job_id):
+        rows = self._execute("SELECT snapshot FROM jobs WHERE job_id = ? AND expires_at >= ?", (job_id, time.time()))
+        return json.loads(rows[0][0]) if rows else None
+
+    def put_result(self, job_id, audio, mime_type, ttl_seconds):
+        self._execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (job_id, mime_type, audio, time.time() + ttl_seconds))
+
+    def get_result(self, job_id):
+        rows = self._execute("SELECT audio, mime_type FROM results WHERE job_id = ? AND expires_at >= ?", (job_id, time.time()))
+        return (bytes(rows[0][0]), rows[0][1]) if rows else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        return {**super().stats(), "path": self.path}
+
+class RedisStateBackend(StateBackend):
+    """
+    State in a Redis-compatible server, shared across hosts. `client` is a
+    redis.Redis-like object (only get/set/mget/delete are used).
+    """
+    def __init__(self, client, key_prefix: str = "tts:"):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def _key(self, kind: str, key: str) -> str:
+        return f"{self.key_prefix}{kind}:{key}"
+
+    @staticmethod
+    def _ttl(ttl_seconds: float) -> int:
+        return max(1, int(ttl_seconds))
+
+    def set_cancelled(self, task_id, ttl_seconds):
+        self.client.set(self._key("cancel", task_id), b"1", ex=self._ttl(ttl_seconds))
+
+    def clear_cancelled(self, task_id):
+        self.client.delete(self._key("cancel", task_id))
+
+    def cancelled_among(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return set()
+        values = self.client.mget([self._key("cancel", task_id) for task_id in task_ids])
+        return {task_id for task_id, value in zip(task_ids, values) if value is not None}
+
+    def put_job(self, job_id, snapshot, ttl_seconds):
+        self.client.set(self._key("job", job_id), json.dumps(snapshot).encode(), ex=self._ttl(ttl_seconds))
+
+    def get_job(self, job_id):
+        value = self.client.get(self._key("job", job_id))
+        return json.loads(value) if value is not None else None
+
+    def put_result(self, job_id, audio, mime_type, ttl_seconds):
+        # One value so the audio and its MIME type always expire together
+        self.client.set(self._key("result", job_id), mime_type.encode() + b"\n" + audio, ex=self._ttl(ttl_seconds))
+
+    def get_result(self, job_id):
+        value = self.client.get(self._key("result", job_id))
+        if value is None:
+            return None
+        mime_type, _, audio = value.partition(b"\n")
+        return audio, mime_type.decode()
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+class FakeRedis:
+    """
+    In-process stand-in for the subset of redis.Redis used by
+    RedisStateBackend, so the Redis code path runs without a server.
+    State is per process, so it is not shared between workers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    def _get(self, name: str) -> Optional[bytes]:
+        item = self._data.get(name)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] < time.time():
+            del self._data[name]
+            return None
+        return item[0]
+
+    def set(self, name: str, value, ex: Optional[int] = None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[name] = (bytes(value), time.time() + ex if ex else None)
+        return True
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            return self._get(name)
+
+    def mget(self, names):
+        with self._lock:
+            return [self._get(name) for name in names]
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+def create_state_backend(kind: str, sqlite_path: str = "", redis_url: str = "") -> StateBackend:
+    """Builds the backend named by the `state_backend` config key."""
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend(sqlite_path)
+    if kind == "redis":
+        if redis_url.startswith("fake://"):
+            logger.warning("Using the in-process fake Redis state backend; state is not shared between processes.")
+            return RedisStateBackend(FakeRedis())
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("state_backend = \"redis\" requires the redis package (pip install redis).")
+        logger.info(f"Using Redis state backend at {redis_url}")
+        return RedisStateBackend(redis.Redis.from_url(redis_url))
+    raise ValueError(f"Unknown state_backend {kind!r} (expected memory, sqlite or redis)")
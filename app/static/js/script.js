@@ -8,7 +8,8 @@ document.addEventListener('DOMContentLoaded', async () => {
         default_chunk_size_chars: 1500,
         default_api_timeout_seconds: 60,
         default_voice_display_name: "Fenrir",
-        default_max_text_chars: 20000
+        default_max_text_chars: 20000,
+        default_stream_playback: false
     };
     try {
         const response = await fetch('/api/config');
@@ -22,6 +23,7 @@ document.addEventListener('DOMContentLoaded', async () => {
             appConfig.default_api_timeout_seconds = config.default_api_timeout_seconds;
             appConfig.default_voice_display_name = config.default_voice_display_name;
             appConfig.default_max_text_chars = config.default_max_text_chars;
+            appConfig.default_stream_playback = config.default_stream_playback;
         }
     } catch (error) {
         console.error('Error loading config:', error);
@@ -46,6 +48,7 @@ document.addEventListener('DOMContentLoaded', async () => {
     const downloadLink = document.getElementById('download-link');
     const audioOutputSection = document.getElementById('audio-output-section');
     const statusMessage = document.getElementById('status-message');
+    const streamToggle = document.getElementById('stream-toggle');
 
     // Initialize controls with config values
     if (appConfig.default_temperature) {
@@ -66,6 +69,9 @@ document.addEventListener('DOMContentLoaded', async () => {
             audioFormatRadio.checked = true;
         }
     }
+    if (streamToggle) {
+        streamToggle.checked = Boolean(appConfig.default_stream_playback);
+    }
     if (appConfig.default_style_prompt) {
         styleInstructionsInput.value = appConfig.default_style_prompt;
         styleCharCount.textContent = `${appConfig.default_style_prompt.length} / ${styleInstructionsInput.maxLength}`;
@@ -76,6 +82,7 @@ document.addEventListener('DOMContentLoaded', async () => {
     let currentTaskId = null;
     let userInitiatedCancel = false;
     let isCancelling = false;
+    let streamAudioContext = null;
 
     function showStatus(message, type = 'info') {
         statusMessage.textContent = message;
@@ -100,6 +107,103 @@ document.addEventListener('DOMContentLoaded', async () => {
         // isCancelling = false; // Do not reset isCancelling here
     }
 
+    function stopStreamingPlayback() {
+        if (streamAudioContext) {
+            streamAudioContext.close().catch(() => {});
+            streamAudioContext = null;
+        }
+    }
+
+    // Streamed WAV is a 44-byte header followed by raw 16-bit mono PCM: schedule it through Web Audio as it arrives
+    async function readStreamingWav(reader, sampleRate) {
+        const parts = [];
+        let header = null;
+        let carry = new Uint8Array(0);
+        let totalBytes = 0;
+        let playhead = 0;
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            parts.push(value);
+            totalBytes += value.length;
+            let bytes = new Uint8Array(carry.length + value.length);
+            bytes.set(carry);
+            bytes.set(value, carry.length);
+            if (!header) {
+                if (bytes.length < 44) { carry = bytes; continue; }
+                header = bytes.slice(0, 44);
+                bytes = bytes.subarray(44);
+            }
+            const usable = bytes.length - (bytes.length % 2);
+            carry = bytes.slice(usable);
+            if (usable === 0 || !streamAudioContext) continue;
+            const samples = new Int16Array(bytes.slice(0, usable).buffer);
+            const audioBuffer = streamAudioContext.createBuffer(1, samples.length, sampleRate);
+            audioBuffer.copyToChannel(Float32Array.from(samples, sample => sample / 32768), 0);
+            const source = streamAudioContext.createBufferSource();
+            source.buffer = audioBuffer;
+            source.connect(streamAudioContext.destination);
+            if (playhead === 0) showStatus('Playing while synthesis continues...', 'info');
+            playhead = Math.max(playhead, streamAudioContext.currentTime + 0.05);
+            source.start(playhead);
+            playhead += audioBuffer.duration;
+        }
+        if (!header) throw new Error('Stream ended before any audio was received.');
+        // The streamed header carries placeholder sizes; patch them so the downloaded file is a valid WAV
+        const dataLength = totalBytes - 44;
+        const view = new DataView(header.buffer);
+        view.setUint32(4, 36 + dataLength, true);
+        view.setUint32(40, dataLength, true);
+        return { blob: new Blob([header, new Blob(parts).slice(44)], { type: 'audio/wav' }), attachedToPlayer: false };
+    }
+
+    // MP3 frames can be fed straight into the <audio> element through MediaSource
+    async function readStreamingMediaSource(reader, mimeType) {
+        const parts = [];
+        const mediaSource = new MediaSource();
+        audioPlayer.src = URL.createObjectURL(mediaSource);
+        audioOutputSection.style.display = 'block';
+        await new Promise(resolve => mediaSource.addEventListener('sourceopen', resolve, { once: true }));
+        const sourceBuffer = mediaSource.addSourceBuffer(mimeType);
+        const appendChunk = chunk => new Promise((resolve, reject) => {
+            sourceBuffer.addEventListener('updateend', resolve, { once: true });
+            sourceBuffer.addEventListener('error', reject, { once: true });
+            sourceBuffer.appendBuffer(chunk);
+        });
+        let started = false;
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            parts.push(value);
+            await appendChunk(value);
+            if (!started) {
+                started = true;
+                showStatus('Playing while synthesis continues...', 'info');
+                audioPlayer.play().catch(err => console.warn('Autoplay blocked:', err));
+            }
+        }
+        if (mediaSource.readyState === 'open') mediaSource.endOfStream();
+        return { blob: new Blob(parts, { type: mimeType }), attachedToPlayer: true };
+    }
+
+    async function readStreamingAudio(response, audioFormat) {
+        const reader = response.body.getReader();
+        if (audioFormat === 'wav') {
+            return readStreamingWav(reader, parseInt(response.headers.get('X-Audio-Sample-Rate')) || 24000);
+        }
+        if (audioFormat === 'mp3' && window.MediaSource && MediaSource.isTypeSupported('audio/mpeg')) {
+            return readStreamingMediaSource(reader, 'audio/mpeg');
+        }
+        // No progressive playback for this format (e.g. FLAC); still read the stream as it arrives
+        const parts = [];
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            parts.push(value);
+        }
+        return { blob: new Blob(parts, { type: response.headers.get('Content-Type') }), attachedToPlayer: false };
+    }
+
     async function loadVoices() {
         showStatus('Loading voices...', 'info');
         synthesizeButton.disabled = true;
@@ -171,6 +275,13 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         currentAbortController = new AbortController();
         currentTaskId = crypto.randomUUID();
+        const audioFormat = document.querySelector('input[name="audio_format"]:checked').value;
+        const useStreaming = streamToggle && streamToggle.checked;
+        stopStreamingPlayback();
+        if (useStreaming && audioFormat === 'wav') {
+            // Create the AudioContext inside the click handler so autoplay policies allow it
+            streamAudioContext = new (window.AudioContext || window.webkitAudioContext)();
+        }
 
         try {
             const response = await fetch('/api/synthesize', {
@@ -178,11 +289,12 @@ document.addEventListener('DOMContentLoaded', async () => {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     task_id: currentTaskId, text, voice_name: voiceName,
-                    audio_format: document.querySelector('input[name="audio_format"]:checked').value,
+                    audio_format: audioFormat,
                     temperature: parseFloat(temperatureSlider.value),
                     style_prompt: styleInstructionsInput.value.trim(),
                     chunk_size_chars: parseInt(chunkSizeSlider.value),
-                    api_timeout_seconds: parseInt(apiTimeoutSlider.value)
+                    api_timeout_seconds: parseInt(apiTimeoutSlider.value),
+                    stream: useStreaming
                 }),
             });
 
@@ -194,12 +306,20 @@ document.addEventListener('DOMContentLoaded', async () => {
                 throw new Error(errorData.detail || `HTTP error! Status: ${response.status}`);
             }
             console.log('Response headers:', [...response.headers.entries()]);
-            const audioBlob = await response.blob();
+            let audioBlob;
+            let attachedToPlayer = false;
+            if (useStreaming) {
+                ({ blob: audioBlob, attachedToPlayer } = await readStreamingAudio(response, audioFormat));
+            } else {
+                audioBlob = await response.blob();
+            }
             console.log('Blob created:', audioBlob);
             const audioUrl = URL.createObjectURL(audioBlob);
             console.log('Object URL created:', audioUrl);
-            audioPlayer.src = audioUrl;
-            audioPlayer.type = audioBlob.type;
+            if (!attachedToPlayer) {
+                audioPlayer.src = audioUrl;
+                audioPlayer.type = audioBlob.type;
+            }
             downloadLink.href = audioUrl;
             const now = new Date();
             const dateStr = `${now.getFullYear()}.${String(now.getMonth() + 1).padStart(2, '0')}.${String(now.getDate()).padStart(2, '0')}-${String(now.getHours()).padStart(2, '0')}.${String(now.getMinutes()).padStart(2, '0')}`;
@@ -219,10 +339,11 @@ document.addEventListener('DOMContentLoaded', async () => {
             cancelButton.disabled = true;
             cancelButton.textContent = 'Cancel';
         } catch (error) {
+            stopStreamingPlayback();
             if (error.name === 'AbortError') {
                 console.log('Fetch aborted.');
                 if (userInitiatedCancel) {
-                    showStatus('Synthesis cancelled by user. Backend notified. This may take some time to fully stop.', 'info');
+                    showStatus('Synthesis cancelled by user. Backend notified.', 'info');
                 } else {
                     showStatus('Synthesis aborted (e.g., navigation or network issue).', 'info');
                 }
@@ -248,7 +369,7 @@ document.addEventListener('DOMContentLoaded', async () => {
             cancelButton.disabled = true;
             synthesizeButton.disabled = true;
             
-            showStatus('Cancellation request sent. Waiting for current operation to complete...', 'info');
+            showStatus('Cancellation request sent...', 'info');
             console.log("Cancel initiated for task:", currentTaskId);
 
             if (currentTaskId) {
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Smaller bodies are not worth compressing
+COMPRESS_MIN_BYTES = 512
+
+# Length of the ETag prefix used as the `v` query parameter of versioned URLs
+VERSION_CHARS = 10
+
+# Types that are already compressed
+_INCOMPRESSIBLE_PREFIXES = ("image/png", "image/jpeg", "image/gif", "image/webp", "audio/", "video/", "font/woff")
+
+def _brotli_compress(data: bytes) -> Optional[bytes]:
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+class CachedAsset:
+    """
+    One response body held in memory with its ETag and gzip/brotli variants,
+    all computed once. response() picks the smallest encoding the client
+    accepts and answers 304 when the client's copy is current.
+    """
+    def __init__(self, body: bytes, media_type: str, cache_control: str):
+        self.body = body
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.encodings: Dict[str, bytes] = {}
+        if len(body) >= COMPRESS_MIN_BYTES and not media_type.startswith(_INCOMPRESSIBLE_PREFIXES):
+            for encoding, compressed in (("br", _brotli_compress(body)), ("gzip", gzip.compress(body, compresslevel=9, mtime=0))):
+                # Keep a variant only if it saves at least 10%
+                if compressed is not None and len(compressed) < len(body) * 0.9:
+                    self.encodings[encoding] = compressed
+
+    @classmethod
+    def from_json(cls, data, cache_control: str = "no-cache") -> "CachedAsset":
+        return cls(json.dumps(data, separators=(",", ":")).encode(), "application/json", cache_control)
+
+    def _etag_for(self, encoding: Optional[str]) -> str:
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+    def _not_modified(self, if_none_match: str) -> bool:
+        if if_none_match.strip() == "*":
+            return True
+        # Any representation of the current body counts (weak comparison, as for GET)
+        tags = {tag.strip().removeprefix("W/").strip('"').split("-")[0] for tag in if_none_match.split(",")}
+        return self.etag in tags
+
+    def response(self, headers: Mapping[str, str], cache_control: Optional[str] = None) -> Response:
+        """`cache_control` overrides the asset's own Cache-Control for this response."""
+        encoding = None
+        if self.encodings:
+            accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+            encoding = next((name for name in ("br", "gzip") if name in self.encodings and name in accepted), None)
+        response_headers = {"ETag": self._etag_for(encoding), "Cache-Control": cache_control or self.cache_control}
+        if self.encodings:
+            response_headers["Vary"] = "Accept-Encoding"
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and self._not_modified(if_none_match):
+            return Response(status_code=304, headers=response_headers)
+        if encoding:
+            response_headers["Content-Encoding"] = encoding
+        body = self.encodings[encoding] if encoding else self.body
+        return Response(content=body, media_type=self.media_type, headers=response_headers)
+
+class StaticAssets:
+    """
+    Every file under `directory`, read and compressed once at startup.
+    url() gives a versioned URL (`/static/<path>?v=<etag>`). Requests carrying
+    the current version are cached for `max_age_seconds` as immutable, since a
+    changed file gets a new URL; any other request (no or stale `v`) is
+    revalidated by ETag.
+    """
+    def __init__(self, directory: Path, url_prefix: str = "/static", max_age_seconds: int = 31536000):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.versioned_cache_control = f"public, max-age={max_age_seconds}, immutable" if max_age_seconds > 0 else "no-cache"
+        self.assets: Dict[str, CachedAsset] = {}
+        for path in sorted(directory.rglob("*")):
+            if path.is_file():
+                media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+                if media_type.startswith("text/") or media_type in ("application/javascript", "image/svg+xml"):
+                    media_type += "; charset=utf-8"
+                self.assets[path.relative_to(directory).as_posix()] = CachedAsset(path.read_bytes(), media_type, "no-cache")
+        total = sum(len(a.body) for a in self.assets.values())
+        logger.info(f"Loaded {len(self.assets)} static files ({total / 1024:.0f} KB) into memory")
+
+    def get(self, rel_path: str) -> Optional[CachedAsset]:
+        return self.assets.get(rel_path)
+
+    @staticmethod
+    def _version(asset: CachedAsset) -> str:
+        return asset.etag[:VERSION_CHARS]
+
+    def url(self, rel_path: str) -> str:
+        return f"{self.url_prefix}/{rel_path}?v={self._version(self.assets[rel_path])}"
+
+    def response(self, rel_path: str, headers: Mapping[str, str], version: Optional[str] = None) -> Optional[Response]:
+        """The asset at `rel_path` (None if there is none); immutable only when `version` is its current one."""
+        asset = self.assets.get(rel_path)
+        if asset is None:
+            return None
+        if version is not None and version == self._version(asset):
+            return asset.response(headers, self.versioned_cache_control)
+        return asset.response(headers)
+
+    def versioned_html(self, rel_path: str) -> CachedAsset:
+        """
+        The HTML page `rel_path` with its references to other static files
+        rewritten to versioned URLs. Pages are revalidated on every load.
+        """
+        html = self.assets[rel_path].body.decode("utf-8")
+        for other in self.assets:
+            html = html.replace(f'"{self.url_prefix}/{other}"', f'"{self.url(other)}"')
+        return CachedAsset(html.encode("utf-8"), "text/html; charset=utf-8", "no-cache")
+
@@ -1,33 +1,136 @@
+import asyncio
 import threading
 import logging
 
+from .state_backend import MemoryStateBackend, StateBackend
+
 logger = logging.getLogger(__name__)
 
 class TaskCancelledError(Exception):
     pass
 
-class TaskRegistry:
-    """Registry for tracking and cancelling active TTS tasks."""
+class _TaskEntry:
+    """Cancellation flag plus the asyncio tasks currently working on a TTS task."""
     def __init__(self):
+        self.event = threading.Event()
+        self.runners = {}  # asyncio.Task -> event loop it runs on
+        self.interrupted = set()  # runners already cancelled for this task id
+
+class TaskRegistry:
+    """
+    Registry for tracking and cancelling active TTS tasks. Safe to use from any thread.
+
+    With a shared state backend, cancel() also records the cancellation there,
+    and watch_remote_cancellations() applies cancellations recorded by other
+    worker processes to the tasks running in this one.
+    """
+    # Cancellation flags outlive any task that could still pick them up
+    CANCEL_FLAG_TTL_SECONDS = 3600
+
+    def __init__(self, backend: StateBackend = None):
         self.tasks = {}
-    
-    def register(self, task_id):
+        self._lock = threading.Lock()
+        self.backend = backend or MemoryStateBackend()
+
+    def use_backend(self, backend: StateBackend):
+        self.backend = backend
+
+    async def register(self, task_id):
         """Register a new task with its cancellation event."""
-        self.tasks[task_id] = threading.Event()
-    
-    def cancel(self, task_id):
-        """Signal cancellation for a task."""
-        if task_id in self.tasks:
-            self.tasks[task_id].set()
-    
+        if self.backend.shared:
+            # Cleared before the task is visible locally, so a stale flag from an earlier run cannot cancel it
+            await asyncio.to_thread(self.backend.clear_cancelled, task_id)
+        with self._lock:
+            self.tasks[task_id] = _TaskEntry()
+
+    def attach(self, task_id, task: asyncio.Task):
+        """
+        Associate a running asyncio task with `task_id` so cancel() interrupts it
+        immediately (in-flight HTTP requests, backoff sleeps, queue waits).
+        Returns False if the task id is unknown.
+        """
+        with self._lock:
+            entry = self.tasks.get(task_id)
+            if entry is None:
+                return False
+            entry.runners[task] = task.get_loop()
+            return True
+
+    def detach(self, task_id, task: asyncio.Task):
+        with self._lock:
+            entry = self.tasks.get(task_id)
+            if entry is not None:
+                entry.runners.pop(task, None)
+                entry.interrupted.discard(task)
+
+    async def cancel(self, task_id):
+        """Signal cancellation for a task and interrupt any attached asyncio tasks, in whichever process runs it."""
+        if self.backend.shared:
+            await asyncio.to_thread(self.backend.set_cancelled, task_id, self.CANCEL_FLAG_TTL_SECONDS)
+        self._cancel_local(task_id)
+
+    def _cancel_local(self, task_id):
+        with self._lock:
+            entry = self.tasks.get(task_id)
+            if entry is None:
+                return
+            entry.event.set()
+            runners = list(entry.runners.items())
+        for task, loop in runners:
+            loop.call_soon_threadsafe(self._interrupt, task_id, task)
+
+    def _interrupt(self, task_id, task: asyncio.Task):
+        """
+        Runs on the task's own loop. The task may have detached since cancel()
+        looked it up, so it is only cancelled if it is still attached to
+        `task_id`, and at most once per attachment.
+        """
+        with self._lock:
+            entry = self.tasks.get(task_id)
+            if entry is None or task not in entry.runners or task in entry.interrupted:
+                return
+            entry.interrupted.add(task)
+        logger.info(f"Interrupting running work for task {task_id}")
+        task.cancel()
+
     def is_cancelled(self, task_id):
         """Check if task has been cancelled."""
-        return task_id in self.tasks and self.tasks[task_id].is_set()
-    
+        with self._lock:
+            entry = self.tasks.get(task_id)
+            return entry is not None and entry.event.is_set()
+
     def unregister(self, task_id):
         """Remove task from registry."""
-        if task_id in self.tasks:
-            del self.tasks[task_id]
+        with self._lock:
+            self.tasks.pop(task_id, None)
+
+    def sync_remote_cancellations(self):
+        """Cancels local tasks that another process has flagged in the shared backend; returns their ids."""
+        with self._lock:
+            pending = [task_id for task_id, entry in self.tasks.items() if not entry.event.is_set()]
+        if not pending:
+            return set()
+        cancelled = self.backend.cancelled_among(pending)
+        for task_id in cancelled:
+            logger.info(f"Task {task_id} was cancelled through another worker")
+            self._cancel_local(task_id)
+        return cancelled
+
+    async def watch_remote_cancellations(self, interval_seconds: float, on_cancel=None):
+        """
+        Polls the shared backend for cancellations until cancelled, calling
+        `on_cancel(task_id)` for each one applied. No-op for a process-local backend.
+        """
+        if not self.backend.shared:
+            return
+        while True:
+            try:
+                for task_id in await asyncio.to_thread(self.sync_remote_cancellations):
+                    if on_cancel is not None:
+                        on_cancel(task_id)
+            except Exception as e:
+                logger.warning(f"Checking the state backend for cancellations failed: {e}")
+            await asyncio.sleep(interval_seconds)
 
 # Global task registry instance
-task_registry = TaskRegistry()
\ No newline at end of file
+task_registry = TaskRegistry()
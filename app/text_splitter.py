@@ -0,0 +1,340 @@
+import math
+import re
+from bisect import bisect_left
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Break strengths: higher is a more natural place to end a chunk
+HARD_CUT, WHITESPACE, CLAUSE, SENTENCE, PARAGRAPH = -1, 0, 1, 2, 3
+
+# Whitespace runs are the fallback breaks. Stronger breaks sit right after
+# their punctuation (plus closing quotes/brackets), which is usually where a
+# whitespace run starts; line breaks upgrade the whitespace run they are in.
+# Each pattern starts with a character class so `re` can skip ahead quickly.
+_SPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[.!?…。！？,;:—–，；：、]+[\"'”’»)\]」』）]*")
+_CJK_PUNCT_RE = re.compile(r"[。！？，；：、]")
+_BEFORE_PUNCT_RUN_RE = re.compile(r"(?s).*[^.!?…。！？,;:—–，；：、\"'”’»)\]」』）]")
+_CJK_SENTENCE = frozenset("。！？")
+_SENTENCE = frozenset(".!?…")
+_CJK_CLAUSE = frozenset("，；：、")
+
+# Hard cuts: words inside stretches with no space or line break, and stops
+# inside a word ("example.com"), where the previous splitter cut as well
+_WORD_RE = re.compile(r"\S+")
+_STRETCH_END_RE = re.compile(r"[ \n]")
+_LAST_STRETCH_END_RE = re.compile(r"(?s).*[ \n]")
+_INNER_STOP_RE = re.compile(r"[.!?](?=\S)")
+
+# Words ending in "." that rarely end a sentence
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e", "cf",
+    "al", "approx", "no", "vol", "fig", "inc", "ltd", "co", "corp", "dept", "jan", "feb", "mar",
+    "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+})
+_WORD_BEFORE_RE = re.compile(r"([\w.]+)$")
+
+# How much one level of break strength is worth in chunk-length deviation, as a fraction of max_length
+_STRENGTH_PER_DEVIATION = 0.25
+
+# First span read when looking for the nearest break on one side of a position; doubled until one is found
+_PROBE_CHARS = 64
+
+def _is_abbreviation(text: str, dot_index: int) -> bool:
+    match = _WORD_BEFORE_RE.search(text, max(0, dot_index - 12), dot_index)
+    if not match:
+        return False
+    word = match.group(1)
+    # Initials ("J. R. R.") and known abbreviations
+    return (len(word) == 1 and word.isupper()) or word.lower().rstrip(".") in ABBREVIATIONS
+
+def _resume(text: str, pos: int) -> int:
+    """Where the chunk after a break at `pos` starts (past any whitespace)."""
+    match = _SPACE_RE.match(text, pos)
+    return match.end() if match else pos
+
+def _punct_run_start(text: str, pos: int) -> int:
+    """Where the punctuation run ending at `pos` starts, looking back at most _PROBE_CHARS characters."""
+    stop = max(0, pos - _PROBE_CHARS)
+    match = _BEFORE_PUNCT_RUN_RE.match(text, stop, pos)
+    return match.end() if match else stop
+
+def punctuation_breaks(text: str, lo: int, hi: int) -> Iterator[Tuple[int, int, bool]]:
+    """
+    Yields (position, strength, unspaced) for the breaks after punctuation
+    between `lo` and `hi` (inclusive), in order; `unspaced` breaks are not
+    followed by whitespace (CJK). Only that span of the text is read, plus
+    at most _PROBE_CHARS characters of a punctuation run it starts inside.
+    """
+    # Back to where the run started, so a run cut by the span edge is not misread
+    scan_lo = _punct_run_start(text, lo)
+    text_length = len(text)
+    # A match ending past `hi` is dropped, so reading one character further
+    # is enough to tell whether a run goes on past the span
+    for match in _PUNCT_RE.finditer(text, scan_lo, hi + 1):
+        pos = match.end()
+        if pos < lo:
+            continue
+        if pos > hi:
+            break
+        # Read runs longer than the probe window from their end, so a break is
+        # judged the same whichever span it was found from
+        punct = text[max(match.start(), pos - _PROBE_CHARS):pos]
+        followed_by_space = pos == text_length or text[pos].isspace()
+        if not _CJK_SENTENCE.isdisjoint(punct):
+            strength = SENTENCE
+        elif not _SENTENCE.isdisjoint(punct):
+            if not followed_by_space or (punct == "." and _is_abbreviation(text, match.start())):
+                continue
+            strength = SENTENCE
+        elif followed_by_space or not _CJK_CLAUSE.isdisjoint(punct):
+            strength = CLAUSE
+        else:
+            continue
+        yield pos, strength, not followed_by_space
+
+def line_breaks(text: str, lo: int, hi: int) -> Iterator[Tuple[int, int]]:
+    """
+    Yields (position, strength) for the line breaks between `lo` and `hi`
+    (inclusive): a blank line is a PARAGRAPH break, a single line break a
+    SENTENCE break. The break sits where the whitespace run around it starts.
+    """
+    for match in _SPACE_RE.finditer(text, lo, hi + 1):
+        run_start = match.start()
+        if run_start == lo and lo > 0 and text[lo - 1].isspace():
+            # Inside a run that started before the span
+            continue
+        run = match.group() if match.end() <= hi else _SPACE_RE.match(text, run_start).group()
+        newlines = run.count("\n")
+        if newlines:
+            yield run_start, PARAGRAPH if newlines > 1 else SENTENCE
+
+class _Breaks:
+    """
+    The places a chunk of text[first:end] may end, looked up on demand: each
+    lookup reads only the text around the position asked about, so the cost
+    of splitting grows with the number of chunks rather than with every
+    space and comma in the text.
+
+    "Cuts" are all allowed chunk ends: `first`, `end`, every whitespace run
+    start and unspaced punctuation break between them ("natural" breaks), and
+    hard cuts inside words: anywhere in a stretch longer than max_length with
+    no space or line break, and after a stop inside any other word. Those are
+    every place the previous splitter could cut, so the fewest chunks over
+    these cuts is never more than it produced.
+    """
+    def __init__(self, text: str, first: int, end: int, max_length: int):
+        self.text = text
+        self.first = first
+        self.end = end
+        self.max_length = max_length
+        # Last gap between consecutive natural cuts looked up; reused while a
+        # long run without breaks is walked through
+        self._gap = (first, first)
+
+    def _space_starts(self, lo: int, hi: int) -> List[int]:
+        text = self.text
+        starts = [match.start() for match in _SPACE_RE.finditer(text, lo, hi + 1)]
+        if starts and starts[0] == lo and lo > 0 and text[lo - 1].isspace():
+            # Inside a run that started before the span
+            starts.pop(0)
+        return starts
+
+    def _unspaced(self, lo: int, hi: int) -> List[int]:
+        # Only runs with CJK punctuation can be unspaced breaks; most spans have none
+        if _CJK_PUNCT_RE.search(self.text, max(0, lo - _PROBE_CHARS), hi + 1) is None:
+            return []
+        return [pos for pos, _, unspaced in punctuation_breaks(self.text, lo, hi) if unspaced]
+
+    def natural_between(self, lo: int, hi: int) -> List[int]:
+        """Natural cuts between `lo` and `hi` (inclusive), sorted."""
+        lo, hi = max(lo, self.first + 1), min(hi, self.end - 1)
+        if lo > hi:
+            return []
+        found = self._space_starts(lo, hi)
+        unspaced = self._unspaced(lo, hi)
+        return sorted(found + unspaced) if unspaced else found
+
+    def _natural_before(self, pos: int) -> int:
+        """The last natural cut before `pos`, else `first`."""
+        hi, step = min(pos, self.end) - 1, _PROBE_CHARS
+        while hi > self.first:
+            lo = max(self.first + 1, hi - step + 1)
+            found = self.natural_between(lo, hi)
+            if found:
+                return found[-1]
+            hi, step = lo - 1, step * 2
+        return self.first
+
+    def _natural_from(self, pos: int) -> int:
+        """The first natural cut at or after `pos`, else `end`."""
+        lo, step = max(pos, self.first + 1), _PROBE_CHARS
+        while lo < self.end:
+            hi = min(self.end - 1, lo + step - 1)
+            found = self.natural_between(lo, hi)
+            if found:
+                return found[0]
+            lo, step = hi + 1, step * 2
+        return self.end
+
+    def gap(self, pos: int) -> Tuple[int, int]:
+        """Consecutive natural cuts (or first/end) p < pos <= q."""
+        p, q = self._gap
+        if not p < pos <= q:
+            p, q = self._natural_before(pos), self._natural_from(pos)
+            self._gap = (p, q)
+        return p, q
+
+    def _in_long_stretch(self, lo: int, hi: int) -> bool:
+        """Whether text[lo:hi] lies in a stretch longer than max_length with no space or line break."""
+        reach = self.max_length - (hi - lo) + 1
+        if reach <= 0:
+            return True
+        # Reading `reach` characters past either side is enough to decide
+        left = _LAST_STRETCH_END_RE.match(self.text, max(self.first, lo - reach), lo)
+        if left is None and lo - reach >= self.first:
+            return True
+        start = left.end() if left else self.first
+        right = _STRETCH_END_RE.search(self.text, hi, min(self.end, start + self.max_length + 1))
+        stop = right.start() if right else min(self.end, start + self.max_length + 1)
+        return stop - start > self.max_length
+
+    def hard_between(self, lo: int, hi: int) -> List[int]:
+        """Hard cuts between `lo` and `hi` (inclusive), sorted."""
+        lo, hi = max(lo, self.first + 1), min(hi, self.end - 1)
+        cuts: List[int] = []
+        for word in _WORD_RE.finditer(self.text, lo - 1, hi + 1):
+            word_lo, word_hi = word.span()
+            if self._in_long_stretch(word_lo, word_hi):
+                cuts.extend(range(max(lo, word_lo + 1), word_hi))
+            else:
+                cuts += [stop.end() for stop in _INNER_STOP_RE.finditer(self.text, word_lo, word_hi)]
+        return cuts
+
+    def around(self, pos: int) -> Tuple[Optional[int], Optional[int]]:
+        """The last cut before `pos` and the first cut at or after it (None past either end)."""
+        if pos <= self.first:
+            return None, self.first
+        if pos > self.end:
+            return self.end, None
+        p, q = self.gap(pos)
+        before, after = p, q
+        # Between natural cuts the text is part of a single word; its hard cuts lie inside it
+        word = _resume(self.text, p)
+        if self._in_long_stretch(word, q):
+            if pos - 1 > word:
+                before = pos - 1
+            if max(pos, word + 1) < q:
+                after = max(pos, word + 1)
+        else:
+            stops = [stop.end() for stop in _INNER_STOP_RE.finditer(self.text, word, q)]
+            i = bisect_left(stops, pos)
+            if i > 0:
+                before = stops[i - 1]
+            if i < len(stops):
+                after = stops[i]
+        return before, after
+
+def _nearest(find: Callable[[int, int], List[int]], lo: int, hi: int, ideal: float) -> Tuple[Optional[int], Optional[int]]:
+    """
+    The last position before `ideal` and the first at or after it that
+    find(a, b) reports between `lo` and `hi`, reading outward from `ideal`
+    in spans that double in size until one turns up on each side.
+    """
+    split = math.ceil(ideal)
+    left = right = None
+    b, step = min(hi, split - 1), _PROBE_CHARS
+    while b >= lo:
+        a = max(lo, b - step + 1)
+        found = find(a, b)
+        if found:
+            left = found[-1]
+            break
+        b, step = a - 1, step * 2
+    a, step = max(lo, split), _PROBE_CHARS
+    while a <= hi:
+        b = min(hi, a + step - 1)
+        found = find(a, b)
+        if found:
+            right = found[0]
+            break
+        a, step = b + 1, step * 2
+    return left, right
+
+def iter_chunk_spans(text: str, max_length: int) -> Iterator[Tuple[int, int]]:
+    """
+    Yields (start, end) offsets of chunks of `text`, each at most `max_length`
+    characters with surrounding whitespace excluded.
+
+    Always uses the fewest chunks possible. Within that, each chunk ends at
+    the break that best trades strength (paragraph, sentence, clause,
+    whitespace) against distance from an even share of the remaining text.
+    Words are cut only where no break between them keeps the count minimal.
+    """
+    if max_length < 1:
+        raise ValueError("max_length must be positive")
+    end = len(text)
+    while end > 0 and text[end - 1].isspace():
+        end -= 1
+    first = _resume(text, 0)
+    if end - first <= max_length:
+        if end > first:
+            yield first, end
+        return
+
+    breaks = _Breaks(text, first, end, max_length)
+
+    # earliest[k]: the first cut from which the rest of the text fits in k
+    # chunks. The fewest-chunks count never grows along the text, so one
+    # greedy step per chunk, back to front, finds them all.
+    earliest = [end]
+    while earliest[-1] > first:
+        target = earliest[-1] - max_length
+        before, cut = breaks.around(target)
+        if before is not None and _resume(text, before) >= target:
+            cut = before
+        if cut >= earliest[-1]:
+            cut = breaks.around(earliest[-1])[0]
+        earliest.append(cut)
+
+    def by_strength(strength: int) -> Callable[[int, int], List[int]]:
+        def find(lo: int, hi: int) -> List[int]:
+            found = [pos for pos, s, _ in punctuation_breaks(text, lo, hi) if s == strength]
+            found += [pos for pos, s in line_breaks(text, lo, hi) if s == strength]
+            return sorted(found)
+        return find
+
+    levels = [
+        (PARAGRAPH, lambda lo, hi: [pos for pos, s in line_breaks(text, lo, hi) if s == PARAGRAPH]),
+        (SENTENCE, by_strength(SENTENCE)),
+        (CLAUSE, lambda lo, hi: [pos for pos, s, _ in punctuation_breaks(text, lo, hi) if s == CLAUSE]),
+        (WHITESPACE, breaks.natural_between),
+        (HARD_CUT, breaks.hard_between),
+    ]
+
+    scale = max_length * _STRENGTH_PER_DEVIATION
+    start, chunks_left = first, len(earliest) - 1
+    while chunks_left > 1:
+        # Cuts that keep the total minimal lie between the first one from which
+        # chunks_left - 1 chunks suffice and the farthest one within reach
+        window_lo = earliest[chunks_left - 1]
+        window_hi = breaks.around(start + max_length + 1)[0]
+        ideal = start + (end - start) / chunks_left
+        best, best_score = window_hi, None
+        for strength, find in levels:
+            lo, hi = window_lo, window_hi
+            if best_score is not None:
+                # Farther than this from the ideal, a break of this strength cannot do better
+                reach = (strength - best_score) * scale
+                if reach <= 0:
+                    continue
+                lo, hi = max(lo, math.floor(ideal - reach) - 1), min(hi, math.ceil(ideal + reach) + 1)
+            for pos in _nearest(find, lo, hi, ideal):
+                if pos is None:
+                    continue
+                score = strength - abs(pos - ideal) / scale
+                if best_score is None or score > best_score:
+                    best, best_score = pos, score
+        yield start, best
+        start = _resume(text, best)
+        chunks_left -= 1
+    yield start, end
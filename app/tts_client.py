@@ -2,21 +2,32 @@ import os
 import json
 import logging
 import base64
-import requests
-import io
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager, nullcontext
+import httpx
 from pathlib import Path
-from pydub import AudioSegment
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
-import time
 import toml
 from .task_registry import task_registry, TaskCancelledError
+from .audio_cache import ChunkAudioCache
+from .checkpoints import CheckpointStore, JobCheckpoint
+from .rate_limiter import AdaptiveRateLimiter
+from .key_pool import ApiKeyPool
+from .hedging import CallTimer, RequestHedger
+from .state_backend import create_state_backend
+from .audio_encoding import MIME_TYPES, STREAMING_WAV_SIZE, EncoderPool, PCMAssembler, wav_header
+from .text_splitter import iter_chunk_spans
+from . import metrics
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 # --- Application Configuration Loading ---
-CONFIG_FILE_PATH = Path(__file__).parent.parent / 'config.toml'
+# GEMINI_TTS_CONFIG points the server at an alternative config file (used by the benchmarks)
+CONFIG_FILE_PATH = Path(os.environ.get("GEMINI_TTS_CONFIG") or Path(__file__).parent.parent / 'config.toml')
 def _get_hardcoded_defaults():
     """Fallback defaults when config.toml is missing"""
     return {
@@ -43,6 +54,7 @@ APP_CONFIG = load_app_config()
 
 GEMINI_API_KEY_ENV_VAR = APP_CONFIG.get("gemini_api_key_env_var")
 DEFAULT_TTS_MODEL_CONFIG = APP_CONFIG.get("default_tts_model")
+GEMINI_API_BASE_URL_CONFIG = APP_CONFIG.get("gemini_api_base_url", "https://generativelanguage.googleapis.com").rstrip("/")
 AUDIO_SAMPLE_RATE = APP_CONFIG.get("audio_sample_rate", 24000)
 MAX_CHUNK_CHARS_API_LIMIT = APP_CONFIG.get("max_chunk_chars_api_limit", 4800)
 DEFAULT_TEMPERATURE_CONFIG = APP_CONFIG.get("default_temperature")
@@ -50,9 +62,112 @@ DEFAULT_CHUNK_SIZE_CHARS_CONFIG = APP_CONFIG.get("default_chunk_size_chars")
 DEFAULT_API_TIMEOUT_SECONDS_CONFIG = APP_CONFIG.get("default_api_timeout_seconds")
 DEFAULT_AUDIO_FORMAT_CONFIG = APP_CONFIG.get("default_audio_format")
 DEFAULT_VOICE_DISPLAY_NAME_CONFIG = APP_CONFIG.get("default_voice_display_name")
+DEFAULT_CHUNK_CONCURRENCY_CONFIG = APP_CONFIG.get("default_chunk_concurrency", 4)
+MAX_CHUNK_CONCURRENCY_CONFIG = APP_CONFIG.get("max_chunk_concurrency", 8)
 SERVER_HOST_CONFIG = APP_CONFIG.get("server_host")
 SERVER_PORT_CONFIG = APP_CONFIG.get("server_port")
 
+# --- Chunk Audio Cache ---
+_cache_dir = APP_CONFIG.get("chunk_cache_dir", "")
+if _cache_dir and not Path(_cache_dir).is_absolute():
+    _cache_dir = str(Path(__file__).parent.parent / _cache_dir)
+chunk_cache = ChunkAudioCache(
+    max_memory_bytes=APP_CONFIG.get("chunk_cache_max_memory_mb", 256) * 1024 * 1024,
+    disk_dir=_cache_dir or None,
+    max_disk_bytes=APP_CONFIG.get("chunk_cache_max_disk_mb", 2048) * 1024 * 1024,
+    enabled=APP_CONFIG.get("chunk_cache_enabled", True),
+)
+
+# --- Resumable Job Checkpoints ---
+_checkpoint_dir = APP_CONFIG.get("checkpoint_dir", "checkpoints")
+if not Path(_checkpoint_dir).is_absolute():
+    _checkpoint_dir = str(Path(__file__).parent.parent / _checkpoint_dir)
+checkpoint_store = CheckpointStore(
+    _checkpoint_dir,
+    enabled=APP_CONFIG.get("checkpoint_enabled", True),
+    ttl_seconds=APP_CONFIG.get("checkpoint_ttl_seconds", 86400),
+)
+
+# --- Encoder Pool (MP3/FLAC via ffmpeg) ---
+encoder_pool = EncoderPool(
+    max_workers=APP_CONFIG.get("encoder_max_workers", os.cpu_count() or 2),
+    max_queue=APP_CONFIG.get("encoder_max_queue", 16),
+)
+
+# --- Shared HTTP Client ---
+HTTP_POOL_SIZE_CONFIG = APP_CONFIG.get("http_pool_size", 20)
+HTTP_KEEPALIVE_SECONDS_CONFIG = APP_CONFIG.get("http_keepalive_seconds", 60)
+HTTP2_ENABLED_CONFIG = APP_CONFIG.get("http2_enabled", True)
+_http_client: Optional[httpx.AsyncClient] = None
+
+# --- Gemini API Keys and Rate Limiting (one limiter per key, shared by all tasks) ---
+GEMINI_API_KEY_ENV_VARS_CONFIG = APP_CONFIG.get("gemini_api_key_env_vars", [])
+API_KEY_QUARANTINE_SECONDS_CONFIG = APP_CONFIG.get("api_key_quarantine_seconds", 30)
+API_KEY_DISABLE_SECONDS_CONFIG = APP_CONFIG.get("api_key_disable_seconds", 3600)
+RATE_LIMIT_MAX_429_RETRIES_CONFIG = APP_CONFIG.get("rate_limit_max_429_retries", 10)
+
+def _new_rate_limiter() -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(
+        requests_per_minute=APP_CONFIG.get("rate_limit_requests_per_minute", 60),
+        chars_per_minute=APP_CONFIG.get("rate_limit_chars_per_minute", 100000),
+        min_rate_fraction=APP_CONFIG.get("rate_limit_min_rate_fraction", 0.1),
+        breaker_threshold=APP_CONFIG.get("circuit_breaker_failure_threshold", 5),
+        breaker_cooldown_seconds=APP_CONFIG.get("circuit_breaker_cooldown_seconds", 30),
+    )
+
+# --- Hedged Chunk Requests ---
+hedger = RequestHedger(
+    enabled=APP_CONFIG.get("hedging_enabled", False),
+    percentile=APP_CONFIG.get("hedge_latency_percentile", 0.95),
+    min_delay_seconds=APP_CONFIG.get("hedge_min_delay_seconds", 2.0),
+    budget_fraction=APP_CONFIG.get("hedge_budget_fraction", 0.05),
+    budget_burst=APP_CONFIG.get("hedge_budget_burst", 5),
+    min_samples=APP_CONFIG.get("hedge_min_samples", 20),
+)
+
+# --- Shared State (cancellation, job progress and results across workers) ---
+_state_sqlite_path = APP_CONFIG.get("state_sqlite_path", "state/tts_state.sqlite3")
+if not Path(_state_sqlite_path).is_absolute():
+    _state_sqlite_path = str(Path(__file__).parent.parent / _state_sqlite_path)
+state_backend = create_state_backend(
+    APP_CONFIG.get("state_backend", "memory"),
+    sqlite_path=_state_sqlite_path,
+    redis_url=APP_CONFIG.get("state_redis_url", ""),
+)
+task_registry.use_backend(state_backend)
+STATE_CANCEL_POLL_SECONDS_CONFIG = APP_CONFIG.get("state_cancel_poll_seconds", 0.5)
+SERVER_WORKERS_CONFIG = APP_CONFIG.get("server_workers", 1)
+
+# --- Audio Post-processing (silence trim, seam crossfade, loudness; needs numpy) ---
+POSTPROCESS_ENABLED_CONFIG = APP_CONFIG.get("postprocess_enabled", False)
+
+@functools.lru_cache(maxsize=1)
+def _postprocessing_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("postprocess_enabled is set but the 'numpy' package is not installed; chunks are joined unprocessed.")
+        return False
+
+def _new_postprocessor():
+    """A ChunkPostProcessor for one task, or None when post-processing is off (numpy is imported here, on first use)."""
+    if not POSTPROCESS_ENABLED_CONFIG or not _postprocessing_available():
+        return None
+    from .audio_postprocess import ChunkPostProcessor
+    return ChunkPostProcessor(
+        AUDIO_SAMPLE_RATE,
+        silence_threshold_dbfs=APP_CONFIG.get("postprocess_silence_threshold_dbfs", -50.0),
+        keep_silence_ms=APP_CONFIG.get("postprocess_keep_silence_ms", 150),
+        crossfade_ms=APP_CONFIG.get("postprocess_crossfade_ms", 15),
+        target_dbfs=APP_CONFIG.get("postprocess_target_dbfs", -20.0),
+        max_gain_db=APP_CONFIG.get("postprocess_max_gain_db", 12.0),
+        cpu_budget_ms=APP_CONFIG.get("postprocess_cpu_budget_ms", 5.0),
+    )
+
+# Encoded pieces buffered between a streaming producer and the HTTP response
+STREAM_BUFFER_PIECES = 8
+
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
@@ -86,13 +201,79 @@ class APITimeoutError(Exception):
     pass
 
 # --- Helper Functions ---
-def get_gemini_api_key():
-    api_key = os.environ.get(GEMINI_API_KEY_ENV_VAR) 
-    if not api_key:
+def _configured_api_keys() -> List[Tuple[str, str]]:
+    """(label, key) for each key found in the configured environment variables, which may hold several comma-separated keys."""
+    env_vars = [GEMINI_API_KEY_ENV_VAR] + [name for name in GEMINI_API_KEY_ENV_VARS_CONFIG if name != GEMINI_API_KEY_ENV_VAR]
+    keys, seen = [], set()
+    for env_var in env_vars:
+        values = [value.strip() for value in (os.environ.get(env_var) or "").split(",") if value.strip()]
+        for index, api_key in enumerate(values):
+            if api_key in seen:
+                continue
+            seen.add(api_key)
+            if not api_key.startswith("AIza") or len(api_key) < 35:
+                logger.warning(f"API key format ({env_var}): {api_key[:5]}... (len: {len(api_key)})")
+            keys.append((env_var if len(values) == 1 else f"{env_var}[{index}]", api_key))
+    return keys
+
+@functools.lru_cache(maxsize=1)
+def get_api_key_pool() -> ApiKeyPool:
+    """Builds the key pool once; missing keys are not cached so they can be fixed without a restart."""
+    keys = _configured_api_keys()
+    if not keys:
         raise ValueError(f"API key not found. Set {GEMINI_API_KEY_ENV_VAR} environment variable.")
-    if not api_key.startswith("AIza") or len(api_key) < 35:
-        logger.warning(f"API key format: {api_key[:5]}... (len: {len(api_key)})")
-    return api_key
+    logger.info(f"Using {len(keys)} Gemini API key(s): {', '.join(label for label, _ in keys)}")
+    return ApiKeyPool(
+        keys, _new_rate_limiter,
+        quarantine_seconds=API_KEY_QUARANTINE_SECONDS_CONFIG,
+        disable_seconds=API_KEY_DISABLE_SECONDS_CONFIG,
+    )
+
+def api_key_pool_stats() -> Dict:
+    try:
+        return get_api_key_pool().stats()
+    except ValueError as e:
+        return {"keys_total": 0, "keys_active": 0, "keys_quarantined": 0, "keys_disabled": 0, "keys": [], "error": str(e)}
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared keep-alive client, creating it on first use if startup did not."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        use_http2 = HTTP2_ENABLED_CONFIG and _http2_available()
+        if HTTP2_ENABLED_CONFIG and not use_http2:
+            logger.warning("http2_enabled is set but the 'h2' package is not installed; using HTTP/1.1.")
+        _http_client = httpx.AsyncClient(
+            http2=use_http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE_CONFIG,
+                max_keepalive_connections=HTTP_POOL_SIZE_CONFIG,
+                keepalive_expiry=HTTP_KEEPALIVE_SECONDS_CONFIG,
+            ),
+            timeout=DEFAULT_API_TIMEOUT_SECONDS_CONFIG,
+        )
+        logger.info(f"Created Gemini HTTP client (pool size {HTTP_POOL_SIZE_CONFIG}, HTTP/2 {'on' if use_http2 else 'off'})")
+    return _http_client
+
+async def start_http_client():
+    """Creates the shared client and resolves the API keys once at app startup."""
+    get_http_client()
+    try:
+        get_api_key_pool()
+    except ValueError as e:
+        logger.warning(f"{e} Synthesis requests will fail until it is set.")
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 def get_available_gemini_voices():
     return [
@@ -101,28 +282,57 @@ def get_available_gemini_voices():
     ]
 
 def _split_text_for_tts(text: str, max_length: int) -> list[str]:
-    chunks = []
-    remaining_text = text.strip()
-    sentence_enders = ['.', '?', '!', '\n']
-    while remaining_text:
-        if len(remaining_text) <= max_length:
-            chunks.append(remaining_text); break
-        split_at = -1
-        for i in range(min(len(remaining_text) - 1, max_length - 1), -1, -1):
-            if remaining_text[i] in sentence_enders: split_at = i + 1; break
-        if split_at == -1:
-            for i in range(min(len(remaining_text) - 1, max_length - 1), -1, -1):
-                if remaining_text[i] == ' ': split_at = i + 1; break
-        if split_at == -1: split_at = max_length
-        chunks.append(remaining_text[:split_at])
-        remaining_text = remaining_text[split_at:].strip()
-    return [chunk for chunk in chunks if chunk]
-
-def _synthesize_with_gemini(text: str, voice_name: str, temperature: float, timeout_seconds_override: Optional[int]) -> bytes:
-    api_key = get_gemini_api_key()
+    return [text[start:end] for start, end in iter_chunk_spans(text, max_length)]
+
+def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Server-suggested wait from a 429: the Retry-After header, else the RetryInfo delay in the error body."""
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+    try:
+        for detail in response.json().get("error", {}).get("details", []):
+            delay = detail.get("retryDelay")
+            if isinstance(delay, str) and delay.endswith("s"):
+                return max(0.0, float(delay[:-1]))
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+@asynccontextmanager
+async def _cancellable(task_id: Optional[str]):
+    """
+    Attaches the current asyncio task to `task_id` in the registry, so a cancel
+    request interrupts whatever it is awaiting (HTTP request, backoff sleep,
+    rate-limit or encoder wait) right away. Registry-initiated cancellation
+    surfaces as TaskCancelledError.
+    """
+    current = asyncio.current_task()
+    if not task_id or not task_registry.attach(task_id, current):
+        yield
+        return
+    try:
+        if task_registry.is_cancelled(task_id):
+            raise TaskCancelledError()
+        yield
+    except asyncio.CancelledError:
+        if not task_registry.is_cancelled(task_id):
+            raise
+        if hasattr(current, "uncancel"):
+            current.uncancel()
+        raise TaskCancelledError() from None
+    finally:
+        task_registry.detach(task_id, current)
+
+async def _synthesize_with_gemini(
+    text: str, voice_name: str, temperature: float, timeout_seconds_override: Optional[int], task_id: Optional[str] = None,
+    call_timer: Optional[CallTimer] = None
+) -> bytes:
+    key_pool = get_api_key_pool()
     model_name = DEFAULT_TTS_MODEL_CONFIG 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent"
-    params = {"key": api_key}
+    url = f"{GEMINI_API_BASE_URL_CONFIG}/v1beta/models/{model_name}:generateContent"
     headers = {"Content-Type": "application/json", "User-Agent": "Gemini-TTS-Server/1.0"}
     payload = {
         "contents": [{"parts": [{"text": text}]}],
@@ -137,26 +347,66 @@ def _synthesize_with_gemini(text: str, voice_name: str, temperature: float, time
     base_backoff_seconds = 1.0
     current_timeout = timeout_seconds_override if timeout_seconds_override and timeout_seconds_override > 0 else DEFAULT_API_TIMEOUT_SECONDS_CONFIG
     last_exception = None
-    for attempt in range(max_retries):
+    client = get_http_client()
+
+    # 429s (and 403s while other keys remain) requeue on the key pool instead of consuming one of the max_retries attempts
+    attempt = 0
+    rate_limited_count = 0
+    while attempt < max_retries:
+        if task_id and task_registry.is_cancelled(task_id):
+            raise TaskCancelledError()
+        with metrics.timed(None, "rate_limit_wait"):
+            api_key = await key_pool.acquire(len(text))
+        # Every HTTP call (including 429 requeues) gets its own attempt number in the latency histogram
+        call_number = attempt + rate_limited_count + 1
         try:
             logger.info(f"Attempt {attempt + 1}/{max_retries}  (timeout: {current_timeout}s)...")
-            response = requests.post(url, params=params, headers=headers, json=payload, timeout=current_timeout)
+            call_started = time.perf_counter()
+            call_status = "error"
+            try:
+                with call_timer or nullcontext():
+                    response = await client.post(url, params={"key": api_key.key}, headers=headers, json=payload, timeout=current_timeout)
+                call_status = str(response.status_code)
+            except httpx.TimeoutException:
+                call_status = "timeout"
+                raise
+            finally:
+                call_seconds = time.perf_counter() - call_started
+                metrics.GEMINI_REQUEST_SECONDS.observe(call_seconds, status=call_status, attempt=call_number)
+                metrics.record_stage("gemini", call_seconds)
             logger.info(f"Response status: {response.status_code}")
             if response.status_code == 429:
-                err_detail = f"Rate limit (429)"; last_exception = requests.exceptions.RequestException(err_detail, response=response)
-                if attempt < max_retries - 1:
-                    time.sleep(base_backoff_seconds * (2**attempt))
-                    logger.info(f"Retrying {err_detail}...")
+                err_detail = "Rate limit (429)"
+                last_exception = httpx.HTTPStatusError(err_detail, request=response.request, response=response)
+                key_pool.on_rate_limited(api_key, _parse_retry_after(response))
+                rate_limited_count += 1
+                if rate_limited_count <= RATE_LIMIT_MAX_429_RETRIES_CONFIG:
+                    logger.info(f"Requeueing after {err_detail} ({rate_limited_count}/{RATE_LIMIT_MAX_429_RETRIES_CONFIG})...")
+                    metrics.GEMINI_RETRIES.inc(reason="rate_limited")
                     continue
                 else: raise last_exception
+            if response.status_code == 403:
+                key_pool.on_forbidden(api_key)
+                last_exception = httpx.HTTPStatusError("Permission denied (403)", request=response.request, response=response)
+                if key_pool.usable_count() > 0:
+                    logger.info(f"Retrying with another API key after a 403 on {api_key.label}...")
+                    metrics.GEMINI_RETRIES.inc(reason="forbidden")
+                    continue
+                raise last_exception
             if response.status_code >= 500:
-                err_detail = f"Server error ({response.status_code})"; last_exception = requests.exceptions.RequestException(err_detail, response=response)
+                key_pool.on_server_error(api_key)
+                err_detail = f"Server error ({response.status_code})"; last_exception = httpx.HTTPStatusError(err_detail, request=response.request, response=response)
                 if attempt < max_retries - 1:
-                    time.sleep(base_backoff_seconds * (2**attempt))
+                    metrics.GEMINI_RETRIES.inc(reason="server_error")
+                    await asyncio.sleep(base_backoff_seconds * (2**attempt))
                     logger.info(f"Retrying {err_detail}...")
+                    attempt += 1
                     continue
                 else: raise last_exception
+            if response.status_code >= 400:
+                key_pool.on_error(api_key)
             response.raise_for_status()
+            key_pool.on_success(api_key)
             response_data = response.json()
             if "candidates" in response_data and response_data["candidates"] and \
                response_data["candidates"][0].get("content", {}).get("parts", [{}])[0].get("inlineData", {}).get("data"):
@@ -164,12 +414,17 @@ def _synthesize_with_gemini(text: str, voice_name: str, temperature: float, time
             elif response_data.get("candidates",[{}])[0].get("content",{}).get("parts",[{}])[0].get("text"):
                 raise ValueError(f"API returned text: '{response_data['candidates'][0]['content']['parts'][0]['text'][:200]}...'")
             raise ValueError(f"Invalid API response: {json.dumps(response_data)[:200]}...")
-        except requests.exceptions.Timeout as e:
+        except TaskCancelledError:
+            raise
+        except httpx.TimeoutException as e:
             last_exception = e
+            key_pool.on_error(api_key)
             logger.warning(f"Timeout on attempt {attempt+1}: {e}")
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             last_exception = e
-            logger.error(f"RequestException on attempt {attempt+1}: {e}")
+            if not isinstance(e, httpx.HTTPStatusError):
+                key_pool.on_error(api_key)
+            logger.error(f"HTTPError on attempt {attempt+1}: {e}")
         except ValueError as e:
             last_exception = e
             logger.error(f"ValueError on attempt {attempt+1}: {e}")
@@ -177,76 +432,404 @@ def _synthesize_with_gemini(text: str, voice_name: str, temperature: float, time
         except Exception as e:
             last_exception = e
             logger.error(f"Unexpected error on attempt {attempt+1}: {e}")
-        if attempt < max_retries - 1 and isinstance(last_exception, (requests.exceptions.Timeout, requests.exceptions.RequestException)):
-            if hasattr(last_exception, 'response') and last_exception.response is not None and last_exception.response.status_code == 403:
-                logger.error("Permission denied (403), not retrying.")
+        if attempt < max_retries - 1 and isinstance(last_exception, httpx.HTTPError):
+            if isinstance(last_exception, httpx.HTTPStatusError) and last_exception.response.status_code in (403, 429):
+                if last_exception.response.status_code == 403:
+                    logger.error("Permission denied (403), not retrying.")
                 break
-            time.sleep(base_backoff_seconds * (2**attempt)); continue
-        elif attempt >= max_retries - 1: break
-    if isinstance(last_exception, requests.exceptions.Timeout):
-        raise APITimeoutError(f"API timed out after {max_retries} attempts. Last: {last_exception}") from last_exception
+            metrics.GEMINI_RETRIES.inc(reason="timeout" if isinstance(last_exception, httpx.TimeoutException) else "http_error")
+            await asyncio.sleep(base_backoff_seconds * (2**attempt))
+            attempt += 1
+            continue
+        break
+    if isinstance(last_exception, httpx.TimeoutException):
+        raise APITimeoutError(f"API timed out after {attempt + 1} attempts. Last: {last_exception}") from last_exception
     elif last_exception: 
-        raise Exception(f"API failed after {max_retries} attempts. Last: {last_exception}") from last_exception
+        raise Exception(f"API failed after {attempt + 1} attempts. Last: {last_exception}") from last_exception
     else: 
-        raise Exception(f"API failed after {max_retries} attempts (unknown reason).")
+        raise Exception(f"API failed after {attempt + 1} attempts (unknown reason).")
+
+def resolve_chunk_concurrency(requested: Optional[int]) -> int:
+    """Per-request chunk concurrency, clamped to the global cap from config.toml."""
+    value = requested if requested is not None else DEFAULT_CHUNK_CONCURRENCY_CONFIG
+    return max(1, min(int(value), MAX_CHUNK_CONCURRENCY_CONFIG))
+
+async def _synthesize_chunk(
+    index: int, total: int, chunk: str, voice_api_name: str, temperature: float,
+    timeout_seconds: Optional[int], task_id: Optional[str], semaphore: asyncio.Semaphore
+) -> bytes:
+    """PCM for one chunk: from the chunk cache, else from Gemini (at most `semaphore` requests in flight)."""
+    cache_key = chunk_cache.make_key(DEFAULT_TTS_MODEL_CONFIG, voice_api_name, temperature, chunk)
+    cached = await chunk_cache.get(cache_key)
+    metrics.CHUNK_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+    if cached is not None:
+        logger.info(f"Task {task_id}: Chunk {index+1}/{total} served from cache ({len(cached)} bytes).")
+        return cached
+    async with semaphore:
+        if task_id and task_registry.is_cancelled(task_id):
+            raise TaskCancelledError()
+        logger.info(f"Task {task_id}: Synthesizing chunk {index+1}/{total} (len {len(chunk)}, timeout: {timeout_seconds}s)...")
+        try:
+            chunk_bytes = await hedger.run(
+                len(chunk), lambda timer: _synthesize_with_gemini(chunk, voice_api_name, temperature, timeout_seconds, task_id, timer)
+            )
+            if not chunk_bytes: raise ValueError("TTS chunk returned no data.")
+            await chunk_cache.put(cache_key, chunk_bytes)
+            return chunk_bytes
+        except TaskCancelledError: raise
+        except Exception as e: raise Exception(f"Chunk {index+1} failed: {e}") from e
+
+async def _iter_chunk_audio(
+    text_chunks: List[str], voice_api_name: str, temperature: float,
+    timeout_seconds: Optional[int], task_id: Optional[str], concurrency: int,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> AsyncIterator[bytes]:
+    """
+    Synthesizes chunks in parallel (at most `concurrency` in flight) and yields
+    their PCM in the original order as soon as each next chunk is ready.
+    A failing chunk or a cancelled task aborts all sibling requests.
+    Pass `semaphore` to share one concurrency budget between several texts.
+    """
+    semaphore = semaphore or asyncio.Semaphore(concurrency)
+    total = len(text_chunks)
+    tasks = [
+        asyncio.create_task(_synthesize_chunk(i, total, chunk, voice_api_name, temperature, timeout_seconds, task_id, semaphore))
+        for i, chunk in enumerate(text_chunks)
+    ]
+    pending = set(tasks)
+    next_index = 0
+    try:
+        while next_index < total:
+            next_task = tasks[next_index]
+            if next_task.done():
+                tasks[next_index] = None  # drop our reference once the PCM is handed out
+                next_index += 1
+                yield next_task.result()
+                continue
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
+                if not finished.cancelled() and finished.exception() is not None:
+                    raise finished.exception()
+            if task_id and task_registry.is_cancelled(task_id):
+                raise TaskCancelledError()
+    finally:
+        outstanding = [t for t in tasks if t is not None and not t.done()]
+        for t in outstanding:
+            t.cancel()
+        if outstanding:
+            await asyncio.gather(*outstanding, return_exceptions=True)
+
+async def _postprocessed(pcm_chunks: AsyncIterator[bytes], total: int) -> AsyncIterator[bytes]:
+    """
+    Passes each chunk's PCM through the post-processing stage (when enabled) as
+    it arrives, off the event loop. Yields exactly one piece per chunk.
+    """
+    processor = _new_postprocessor()
+    try:
+        index = 0
+        async for pcm in pcm_chunks:
+            index += 1
+            if processor is not None:
+                pcm = await asyncio.to_thread(processor.process, pcm, index == total)
+            yield pcm
+    finally:
+        await pcm_chunks.aclose()
+        if processor is not None and processor.stats()["chunks"]:
+            logger.info(f"Post-processing: {processor.stats()}")
 
-def synthesize_speech_with_gemini(
+def _prepare_synthesis(
+    text: str, voice_display_name: str, temperature: float,
+    chunk_size_chars: Optional[int], api_timeout_seconds: Optional[int],
+    chunk_concurrency: Optional[int], task_id: Optional[str]
+) -> Tuple[List[str], str, float, int, int]:
+    """Splits the text and resolves per-request settings shared by the buffered and streaming paths."""
+    final_timeout = api_timeout_seconds if api_timeout_seconds is not None else DEFAULT_API_TIMEOUT_SECONDS_CONFIG
+    final_chunk_size = chunk_size_chars if chunk_size_chars is not None else DEFAULT_CHUNK_SIZE_CHARS_CONFIG
+    logger.info(f"TTS task {task_id}: Voice='{voice_display_name}', Temp={temperature}, ChunkTarget={final_chunk_size}, Timeout={final_timeout}s")
+    if task_id and task_registry.is_cancelled(task_id):
+        raise TaskCancelledError()
+
+    effective_chunk_size = min(final_chunk_size, MAX_CHUNK_CHARS_API_LIMIT)
+    with metrics.timed(metrics.TEXT_SPLIT_SECONDS, "split"):
+        text_chunks = _split_text_for_tts(text, max_length=effective_chunk_size)
+    metrics.TEXT_CHUNKS.observe(len(text_chunks))
+    if not text_chunks or not text_chunks[0].strip(): raise ValueError("No processable text.")
+    logger.info(f"Task {task_id}: Text (len {len(text)}) split into {len(text_chunks)} chunks (target size {effective_chunk_size}).")
+
+    api_name = DISPLAY_NAME_TO_API_NAME_MAP.get(voice_display_name, voice_display_name)
+    temp = min(max(temperature, 0.0), 2.0)
+    concurrency = resolve_chunk_concurrency(chunk_concurrency)
+    logger.info(f"Task {task_id}: Dispatching {len(text_chunks)} chunks with concurrency {concurrency}.")
+    return text_chunks, api_name, temp, final_timeout, concurrency
+
+async def synthesize_speech_with_gemini(
     text: str, voice_display_name: str = DEFAULT_VOICE_DISPLAY_NAME_CONFIG, 
     audio_format: str = DEFAULT_AUDIO_FORMAT_CONFIG,
     temperature: float = DEFAULT_TEMPERATURE_CONFIG,
     chunk_size_chars: Optional[int] = None, 
     api_timeout_seconds: Optional[int] = None,
-    task_id: Optional[str] = None
+    task_id: Optional[str] = None,
+    chunk_concurrency: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    chunk_slots: Optional[asyncio.Semaphore] = None
 ) -> Tuple[bytes, str]:
-    final_timeout = api_timeout_seconds if api_timeout_seconds is not None else DEFAULT_API_TIMEOUT_SECONDS_CONFIG
-    final_chunk_size = chunk_size_chars if chunk_size_chars is not None else DEFAULT_CHUNK_SIZE_CHARS_CONFIG
-    logger.info(f"TTS task {task_id}: Voice='{voice_display_name}', Format='{audio_format}', Temp={temperature}, ChunkTarget={final_chunk_size}, Timeout={final_timeout}s")
+    target_fmt = audio_format.lower()
+    started = time.perf_counter()
+    outcome = "failed"
+    metrics.TASKS_IN_FLIGHT.inc()
     try:
-        if task_id and task_registry.is_cancelled(task_id):
-            raise TaskCancelledError()
-        
-        effective_chunk_size = min(final_chunk_size, MAX_CHUNK_CHARS_API_LIMIT)
-        text_chunks = _split_text_for_tts(text, max_length=effective_chunk_size)
-        if not text_chunks or not text_chunks[0].strip(): raise ValueError("No processable text.")
-        logger.info(f"Task {task_id}: Text (len {len(text)}) split into {len(text_chunks)} chunks (target size {effective_chunk_size}).")
-        
-        audio_segments = []
-        for i, chunk in enumerate(text_chunks):
-            if task_id and task_registry.is_cancelled(task_id):
-                raise TaskCancelledError()
-            logger.info(f"Task {task_id}: Synthesizing chunk {i+1}/{len(text_chunks)} (len {len(chunk)})...")
-            try:
-                api_name = DISPLAY_NAME_TO_API_NAME_MAP.get(voice_display_name, voice_display_name)
-                temp = min(max(temperature, 0.0), 2.0)
-                
-                # Detailed progress logging
-                progress_msg = f"Task {task_id}: Processing chunk {i+1}/{len(text_chunks)} (attempt 1/3, timeout: {final_timeout}s)"
-                logger.info(progress_msg)
-                
-                chunk_bytes = _synthesize_with_gemini(chunk, api_name, temp, final_timeout)
-                if chunk_bytes:
-                    audio_segments.append(AudioSegment(data=chunk_bytes, sample_width=2, frame_rate=AUDIO_SAMPLE_RATE, channels=1))
-                else: raise ValueError("TTS chunk returned no data.")
-            except TaskCancelledError: raise
-            except Exception as e: raise Exception(f"Chunk {i+1} failed: {e}") from e
-        if not audio_segments: raise ValueError("No audio segments produced.")
+        async with _cancellable(task_id):
+            if target_fmt != "wav":
+                # Fail fast rather than spend API quota on audio we could not encode
+                encoder_pool.check_admission()
+            text_chunks, api_name, temp, final_timeout, concurrency = _prepare_synthesis(
+                text, voice_display_name, temperature, chunk_size_chars, api_timeout_seconds, chunk_concurrency, task_id
+            )
+
+            assembler = PCMAssembler(AUDIO_SAMPLE_RATE)
+            assembly_seconds = 0.0
+            if on_progress: on_progress(0, len(text_chunks))
+            pcm_chunks = _postprocessed(_iter_chunk_audio(text_chunks, api_name, temp, final_timeout, task_id, concurrency, chunk_slots), len(text_chunks))
+            async for chunk_bytes in pcm_chunks:
+                append_started = time.perf_counter()
+                assembler.append(chunk_bytes)
+                assembly_seconds += time.perf_counter() - append_started
+                if on_progress: on_progress(assembler.chunk_count, len(text_chunks))
+            if not assembler.chunk_count: raise ValueError("No audio segments produced.")
         
-        logger.info(f"Task {task_id}: Concatenating {len(audio_segments)} audio segments.")
-        combined = sum(audio_segments) if len(audio_segments) > 1 else audio_segments[0]
-        buffer = io.BytesIO()
-        target_fmt = audio_format.lower()
-        combined.export(buffer, format=target_fmt)
-        final_data = buffer.getvalue()
-        mime = f"audio/{target_fmt}" 
-        if target_fmt == 'flac': mime = 'audio/flac'
-        logger.info(f"Task {task_id} synthesis completed ({len(final_data)} bytes)")
-        return final_data, mime
-    except TaskCancelledError as e:
+            logger.info(f"Task {task_id}: Assembled {assembler.chunk_count} audio segments ({len(assembler)} PCM bytes).")
+            if target_fmt == "wav":
+                wav_started = time.perf_counter()
+                final_data = assembler.to_wav()
+                assembly_seconds += time.perf_counter() - wav_started
+            metrics.PCM_ASSEMBLY_SECONDS.observe(assembly_seconds)
+            metrics.record_stage("assemble", assembly_seconds)
+            if target_fmt != "wav":
+                # ffmpeg gets the whole PCM buffer over stdin from the bounded encoder pool
+                final_data = await encoder_pool.encode(assembler.pcm_view(), target_fmt, AUDIO_SAMPLE_RATE)
+            mime = MIME_TYPES[target_fmt]
+            metrics.RESPONSE_SIZE_BYTES.observe(len(final_data), format=target_fmt, mode="buffered")
+            outcome = "completed"
+            logger.info(f"Task {task_id} synthesis completed ({len(final_data)} bytes)")
+            return final_data, mime
+    except TaskCancelledError:
+        outcome = "cancelled"
         logger.info(f"Task {task_id} cancelled")
         raise
     except Exception as e:
         logger.error(f"Task {task_id} synthesis failed: {e}")
         raise
     finally:
-        if task_id:
-            task_registry.unregister(task_id)
+        metrics.TASKS_IN_FLIGHT.dec()
+        metrics.SYNTHESIS_SECONDS.observe(time.perf_counter() - started, format=target_fmt, outcome=outcome)
+
+async def _fill_checkpoint(
+    checkpoint: JobCheckpoint, text_chunks: List[str], voice_api_name: str, temperature: float,
+    timeout_seconds: Optional[int], task_id: Optional[str], concurrency: int,
+    on_progress: Optional[Callable[[int, int], None]] = None
+):
+    """Synthesizes the chunks missing from `checkpoint`, writing each one to disk as soon as it arrives."""
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(text_chunks)
+    if on_progress: on_progress(checkpoint.completed_count, total)
+
+    async def run_chunk(index: int):
+        pcm = await _synthesize_chunk(index, total, text_chunks[index], voice_api_name, temperature, timeout_seconds, task_id, semaphore)
+        await asyncio.to_thread(checkpoint.save, index, pcm)
+
+    tasks = [asyncio.create_task(run_chunk(i)) for i in checkpoint.missing()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            await finished
+            if on_progress: on_progress(checkpoint.completed_count, total)
+    finally:
+        outstanding = [t for t in tasks if not t.done()]
+        for t in outstanding:
+            t.cancel()
+        if outstanding:
+            await asyncio.gather(*outstanding, return_exceptions=True)
+
+def _checkpoint_pcm(checkpoint: JobCheckpoint) -> Iterator[bytes]:
+    """The checkpoint's PCM in order, chunk by chunk through post-processing when it is enabled."""
+    processor = _new_postprocessor()
+    if processor is None:
+        yield from checkpoint.iter_pcm()
+        return
+    for index, pcm in enumerate(checkpoint.iter_chunks()):
+        yield processor.process(pcm, final=index == checkpoint.chunk_count - 1)
+    logger.info(f"Post-processing: {processor.stats()}")
+
+async def _assemble_checkpoint(checkpoint: JobCheckpoint, target_fmt: str, output_path: Path):
+    """Writes the output file from the checkpointed chunks, streaming them from disk."""
+    partial = output_path.with_suffix(".part")
+    if target_fmt == "wav":
+        def write_wav():
+            with open(partial, "wb") as f:
+                f.write(wav_header(0, AUDIO_SAMPLE_RATE))
+                length = 0
+                for block in _checkpoint_pcm(checkpoint):
+                    f.write(block)
+                    length += len(block)
+                f.seek(0)
+                f.write(wav_header(length, AUDIO_SAMPLE_RATE))
+        await asyncio.to_thread(write_wav)
+    else:
+        blocks = _checkpoint_pcm(checkpoint)
+
+        async def pcm_blocks() -> AsyncIterator[bytes]:
+            while True:
+                block = await asyncio.to_thread(next, blocks, None)
+                if block is None:
+                    return
+                yield block
+
+        f = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for encoded in encoder_pool.encode_stream(pcm_blocks(), target_fmt, AUDIO_SAMPLE_RATE):
+                await asyncio.to_thread(f.write, encoded)
+        finally:
+            await asyncio.to_thread(f.close)
+    await asyncio.to_thread(os.replace, partial, output_path)
+
+async def synthesize_speech_to_checkpoint(
+    checkpoint_id: str, text: str, voice_display_name: str = DEFAULT_VOICE_DISPLAY_NAME_CONFIG,
+    audio_format: str = DEFAULT_AUDIO_FORMAT_CONFIG,
+    temperature: float = DEFAULT_TEMPERATURE_CONFIG,
+    chunk_size_chars: Optional[int] = None,
+    api_timeout_seconds: Optional[int] = None,
+    task_id: Optional[str] = None,
+    chunk_concurrency: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> Tuple[Path, str]:
+    """
+    Resumable counterpart of synthesize_speech_with_gemini for long jobs. Each
+    chunk's PCM is written to the checkpoint of `checkpoint_id` as it arrives,
+    and the output file is assembled from disk, so segments are never all held
+    in memory. Chunks saved by an earlier failed or cancelled run of the same
+    text and settings are not requested again. Returns the output file's path.
+    """
+    target_fmt = audio_format.lower()
+    started = time.perf_counter()
+    outcome = "failed"
+    metrics.TASKS_IN_FLIGHT.inc()
+    try:
+        async with _cancellable(task_id):
+            if target_fmt != "wav":
+                encoder_pool.check_admission()
+            text_chunks, api_name, temp, final_timeout, concurrency = _prepare_synthesis(
+                text, voice_display_name, temperature, chunk_size_chars, api_timeout_seconds, chunk_concurrency, task_id
+            )
+            chunk_keys = [chunk_cache.make_key(DEFAULT_TTS_MODEL_CONFIG, api_name, temp, chunk) for chunk in text_chunks]
+            checkpoint = await asyncio.to_thread(checkpoint_store.open, checkpoint_id, chunk_keys)
+            output_path = checkpoint.output_path(target_fmt)
+            if output_path.exists():
+                # Already assembled by an earlier run of the same chunks
+                logger.info(f"Task {task_id}: Reusing assembled output from checkpoint {checkpoint_id}.")
+                if on_progress: on_progress(len(text_chunks), len(text_chunks))
+            else:
+                await _fill_checkpoint(checkpoint, text_chunks, api_name, temp, final_timeout, task_id, concurrency, on_progress)
+                with metrics.timed(metrics.PCM_ASSEMBLY_SECONDS, "assemble"):
+                    await _assemble_checkpoint(checkpoint, target_fmt, output_path)
+                await asyncio.to_thread(checkpoint.discard_chunks)
+            size = output_path.stat().st_size
+            metrics.RESPONSE_SIZE_BYTES.observe(size, format=target_fmt, mode="checkpoint")
+            outcome = "completed"
+            logger.info(f"Task {task_id} synthesis completed ({size} bytes at {output_path})")
+            return output_path, MIME_TYPES[target_fmt]
+    except TaskCancelledError:
+        outcome = "cancelled"
+        logger.info(f"Task {task_id} cancelled (checkpoint {checkpoint_id} kept for resume)")
+        raise
+    except Exception as e:
+        logger.error(f"Task {task_id} synthesis failed: {e} (checkpoint {checkpoint_id} kept for resume)")
+        raise
+    finally:
+        metrics.TASKS_IN_FLIGHT.dec()
+        metrics.SYNTHESIS_SECONDS.observe(time.perf_counter() - started, format=target_fmt, outcome=outcome)
+
+async def stream_speech_with_gemini(
+    text: str, voice_display_name: str = DEFAULT_VOICE_DISPLAY_NAME_CONFIG,
+    audio_format: str = DEFAULT_AUDIO_FORMAT_CONFIG,
+    temperature: float = DEFAULT_TEMPERATURE_CONFIG,
+    chunk_size_chars: Optional[int] = None,
+    api_timeout_seconds: Optional[int] = None,
+    task_id: Optional[str] = None,
+    chunk_concurrency: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Streaming counterpart of synthesize_speech_with_gemini. Yields encoded audio
+    as soon as each chunk (in order) is available: a WAV header followed by raw
+    PCM, or MP3/FLAC frames from an incremental ffmpeg encoder.
+
+    Synthesis runs in its own producer task (attached to the task registry, so
+    cancellation interrupts it) and hands pieces over through a small queue.
+    """
+    pieces = asyncio.Queue(maxsize=STREAM_BUFFER_PIECES)
+    finished = object()
+
+    async def produce():
+        try:
+            async with _cancellable(task_id):
+                async for piece in _produce_stream(text, voice_display_name, audio_format, temperature, chunk_size_chars, api_timeout_seconds, task_id, chunk_concurrency):
+                    await pieces.put(piece)
+            await pieces.put(finished)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await pieces.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await pieces.get()
+            if item is finished:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+async def _produce_stream(
+    text: str, voice_display_name: str, audio_format: str, temperature: float,
+    chunk_size_chars: Optional[int], api_timeout_seconds: Optional[int],
+    task_id: Optional[str], chunk_concurrency: Optional[int]
+) -> AsyncIterator[bytes]:
+    target_fmt = audio_format.lower()
+    pcm_chunks = None
+    started = time.perf_counter()
+    outcome = "failed"
+    metrics.TASKS_IN_FLIGHT.inc()
+    try:
+        text_chunks, api_name, temp, final_timeout, concurrency = _prepare_synthesis(
+            text, voice_display_name, temperature, chunk_size_chars, api_timeout_seconds, chunk_concurrency, task_id
+        )
+        pcm_chunks = _postprocessed(_iter_chunk_audio(text_chunks, api_name, temp, final_timeout, task_id, concurrency), len(text_chunks))
+        total_bytes = 0
+        if target_fmt == "wav":
+            header = wav_header(STREAMING_WAV_SIZE, AUDIO_SAMPLE_RATE)
+            async for chunk_bytes in pcm_chunks:
+                # Send the header together with the first chunk so early failures surface before any output
+                total_bytes += len(header) + len(chunk_bytes)
+                yield header + chunk_bytes
+                header = b""
+        else:
+            async for encoded in encoder_pool.encode_stream(pcm_chunks, target_fmt, AUDIO_SAMPLE_RATE):
+                total_bytes += len(encoded)
+                yield encoded
+        metrics.RESPONSE_SIZE_BYTES.observe(total_bytes, format=target_fmt, mode="stream")
+        outcome = "completed"
+        logger.info(f"Task {task_id} streaming synthesis completed ({total_bytes} bytes)")
+    except (TaskCancelledError, asyncio.CancelledError):
+        outcome = "cancelled"
+        logger.info(f"Task {task_id} cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"Task {task_id} streaming synthesis failed: {e}")
+        raise
+    finally:
+        metrics.TASKS_IN_FLIGHT.dec()
+        metrics.SYNTHESIS_SECONDS.observe(time.perf_counter() - started, format=target_fmt, outcome=outcome)
+        if pcm_chunks is not None:
+            await pcm_chunks.aclose()
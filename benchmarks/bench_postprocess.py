@@ -0,0 +1,91 @@
+"""
+Micro-benchmark for the audio post-processing stage (app/audio_postprocess.py).
+
+Feeds synthetic speech-like chunks (noise bursts shaped like syllables, with
+uneven loudness, edge silence and a DC offset that makes seams click) through
+ChunkPostProcessor one at a time, as the server does, and reports CPU time per
+second of audio against the budget, plus the spread of per-chunk speech
+loudness and the sample jumps at seams before and after, as JSON. Exits
+non-zero when the p95 CPU time is over the budget.
+
+    python benchmarks/bench_postprocess.py --chunks 50 --chunk-seconds 20 --budget-ms 5
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.audio_postprocess import ChunkPostProcessor  # noqa: E402
+
+def make_chunk(rng: np.random.Generator, sample_rate: int, seconds: float) -> np.ndarray:
+    """Syllable-like bursts at a random level, framed by 0.1-1.5 s of near-silence."""
+    syllables = int(seconds * 4)
+    envelope = np.repeat(rng.uniform(0.2, 1.0, syllables) * (rng.random(syllables) > 0.15), sample_rate // 4)
+    envelope = np.convolve(envelope, np.hanning(sample_rate // 20), mode="same") / (sample_rate // 40)
+    level = 10 ** (rng.uniform(-32, -12) / 20) * 32768
+    speech = rng.standard_normal(len(envelope)) * envelope * level
+    lead, trail = (np.zeros(int(rng.uniform(0.1, 1.5) * sample_rate)) for _ in range(2))
+    audio = np.concatenate((lead, speech, trail)) + rng.standard_normal(len(lead) + len(speech) + len(trail)) * 3
+    audio += rng.uniform(-400, 400)  # DC offset: the seam click
+    return np.clip(audio, -32768, 32767).astype("<i2")
+
+def speech_level_db(audio: np.ndarray, sample_rate: int) -> float:
+    """RMS level (dBFS) of the 10 ms frames that contain speech."""
+    frame = sample_rate // 100
+    count = len(audio) // frame
+    rms = np.sqrt(np.mean(np.square(audio[:count * frame].reshape(count, frame), dtype=np.float64), axis=1))
+    speech = rms[rms > 32768 * 10 ** (-45 / 20)]
+    return float(20 * np.log10(np.sqrt(np.mean(np.square(speech))) / 32768))
+
+def seam_stats(pieces: list) -> dict:
+    jumps = [abs(int(b[0]) - int(a[-1])) for a, b in zip(pieces, pieces[1:]) if len(a) and len(b)]
+    return {"max_seam_jump": max(jumps), "mean_seam_jump": round(statistics.mean(jumps), 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audio post-processing.")
+    parser.add_argument("--chunks", type=int, default=50)
+    parser.add_argument("--chunk-seconds", type=float, default=20.0)
+    parser.add_argument("--sample-rate", type=int, default=24000)
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="CPU budget in ms per second of audio.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    chunks = [make_chunk(rng, args.sample_rate, rng.uniform(0.5, 1.5) * args.chunk_seconds) for _ in range(args.chunks)]
+    processor = ChunkPostProcessor(args.sample_rate, cpu_budget_ms=args.budget_ms)
+    processed, per_chunk = [], []
+    for index, chunk in enumerate(chunks):
+        started = time.thread_time()
+        out = processor.process(chunk.tobytes(), final=index == len(chunks) - 1)
+        per_chunk.append((time.thread_time() - started) * 1000 / (len(chunk) / args.sample_rate))
+        processed.append(np.frombuffer(out, dtype="<i2"))
+
+    before, after = np.concatenate(chunks), np.concatenate(processed)
+    levels_before = [speech_level_db(c, args.sample_rate) for c in chunks]
+    levels_after = [speech_level_db(c, args.sample_rate) for c in processed]
+    ordered = sorted(per_chunk)
+    results = {
+        "audio_seconds": round(len(before) / args.sample_rate, 1),
+        "output_seconds": round(len(after) / args.sample_rate, 1),
+        "cpu_ms_per_audio_second": {
+            "mean": round(statistics.mean(per_chunk), 3),
+            "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+            "max": round(ordered[-1], 3),
+            "budget": args.budget_ms,
+        },
+        "chunk_speech_level_stdev_db": {"before": round(statistics.pstdev(levels_before), 2), "after": round(statistics.pstdev(levels_after), 2)},
+        "seams": {"before": seam_stats(chunks), "after": seam_stats(processed)},
+        "processor": processor.stats(),
+    }
+    print(json.dumps(results, indent=2))
+    if results["cpu_ms_per_audio_second"]["p95"] > args.budget_ms:
+        print(f"p95 CPU time per second of audio is over the {args.budget_ms} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark for the text splitter on large inputs.
+
+Compares app.text_splitter against the previous backward-scanning splitter on
+~1 MB of mixed prose (abbreviations, quotes, paragraphs, CJK) and on ~1 MB of a
+single punctuation run (no break anywhere), and reports time, chunk count and
+chunk length spread as JSON.
+
+    python benchmarks/bench_splitter.py --size-mb 1 --max-lengths 500,1500,4500
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.text_splitter import iter_chunk_spans  # noqa: E402
+
+_PROSE = [
+    "Dr. Watson arrived at 221B Baker St. shortly after noon.",
+    "“Are you quite sure?” she asked, glancing at the clock.",
+    "The results, e.g. the latency figures, were inconclusive; more data was needed.",
+    "It rained all day!",
+    "Mr. and Mrs. Dursley, of number four, Privet Drive, were proud to say that they were perfectly normal.",
+    "Why would anyone do that?",
+    "東京は日本の首都です。人口はとても多いです！",
+    "He paused — then continued without another word.",
+]
+
+def make_corpus(size_bytes: int, seed: int) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < size_bytes:
+        sentence = rng.choice(_PROSE)
+        parts.append(sentence)
+        parts.append("\n\n" if rng.random() < 0.05 else " ")
+        size += len(sentence.encode()) + 1
+    return "".join(parts)
+
+def make_punctuation_run(size_bytes: int) -> str:
+    return "。" * (size_bytes // len("。".encode()))
+
+def legacy_split(text: str, max_length: int) -> list:
+    """The splitter this module replaced, kept here as the baseline."""
+    chunks = []
+    remaining_text = text.strip()
+    sentence_enders = ['.', '?', '!', '\n']
+    while remaining_text:
+        if len(remaining_text) <= max_length:
+            chunks.append(remaining_text); break
+        split_at = -1
+        for i in range(min(len(remaining_text) - 1, max_length - 1), -1, -1):
+            if remaining_text[i] in sentence_enders: split_at = i + 1; break
+        if split_at == -1:
+            for i in range(min(len(remaining_text) - 1, max_length - 1), -1, -1):
+                if remaining_text[i] == ' ': split_at = i + 1; break
+        if split_at == -1: split_at = max_length
+        chunks.append(remaining_text[:split_at])
+        remaining_text = remaining_text[split_at:].strip()
+    return [chunk for chunk in chunks if chunk]
+
+def new_split(text: str, max_length: int) -> list:
+    return [text[s:e] for s, e in iter_chunk_spans(text, max_length)]
+
+def measure(split, text: str, max_length: int, repeat: int) -> dict:
+    timings, chunks = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = split(text, max_length)
+        timings.append(time.perf_counter() - started)
+    lengths = [len(c) for c in chunks]
+    return {
+        "seconds_best": round(min(timings), 4),
+        "seconds_median": round(statistics.median(timings), 4),
+        "chunks": len(chunks),
+        "min_chars": min(lengths),
+        "mean_chars": round(statistics.mean(lengths), 1),
+        "max_chars": max(lengths),
+        "stdev_chars": round(statistics.pstdev(lengths), 1),
+        "last_chunk_chars": lengths[-1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TTS text splitter.")
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--max-lengths", default="500,1500,4500")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the current splitter.")
+    args = parser.parse_args()
+
+    size_bytes = int(args.size_mb * 1024 * 1024)
+    results = {}
+    for name, text in (("prose", make_corpus(size_bytes, args.seed)), ("punctuation_run", make_punctuation_run(size_bytes))):
+        corpus = {"input_chars": len(text), "input_bytes": len(text.encode()), "runs": []}
+        for max_length in (int(v) for v in args.max_lengths.split(",")):
+            run = {"max_length": max_length, "splitter": measure(new_split, text, max_length, args.repeat)}
+            if not args.skip_legacy:
+                run["legacy"] = measure(legacy_split, text, max_length, args.repeat)
+            corpus["runs"].append(run)
+            print(f"{name} max_length={max_length} done", file=sys.stderr)
+        results[name] = corpus
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
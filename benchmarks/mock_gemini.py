@@ -0,0 +1,119 @@
+"""
+Local stand-in for the Gemini `generateContent` endpoint, for benchmarking.
+
+Returns base64-encoded 16-bit mono PCM (a quiet sine tone) after a configurable
+latency, and injects 429 / 5xx responses at configurable rates. Per-key quotas
+(--key-rpm) and rejected keys (--forbidden-keys) exercise the API key pool.
+
+    python benchmarks/mock_gemini.py --port 8765 --latency-ms 800 --jitter-ms 200 --rate-429 0.02
+
+Point the server at it with `gemini_api_base_url = "http://127.0.0.1:8765"`
+in config.toml (run_benchmark.py does this for you).
+"""
+import argparse
+import asyncio
+import base64
+import functools
+import math
+import random
+import struct
+import time
+from collections import deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+def build_app(args) -> FastAPI:
+    app = FastAPI(title="Mock Gemini TTS")
+    rng = random.Random(args.seed)
+    counters = {"requests": 0, "ok": 0, "rate_limited": 0, "server_errors": 0, "forbidden": 0, "per_key": {}}
+    forbidden_keys = set(filter(None, args.forbidden_keys.split(",")))
+    recent_by_key = {}
+
+    def over_key_quota(key: str) -> bool:
+        """Sliding one-minute request window per key."""
+        if args.key_rpm <= 0:
+            return False
+        now = time.monotonic()
+        recent = recent_by_key.setdefault(key, deque())
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        if len(recent) >= args.key_rpm:
+            return True
+        recent.append(now)
+        return False
+
+    @functools.lru_cache(maxsize=256)
+    def pcm_base64(sample_count: int) -> str:
+        tone = [int(1000 * math.sin(2 * math.pi * 220 * i / args.sample_rate)) for i in range(args.sample_rate // 220)]
+        samples = (tone * (sample_count // len(tone) + 1))[:sample_count]
+        return base64.b64encode(struct.pack(f"<{sample_count}h", *samples)).decode()
+
+    def audio_seconds_for(text: str) -> float:
+        if args.audio_seconds > 0:
+            return args.audio_seconds
+        return max(0.1, len(text) / args.chars_per_second)
+
+    @app.post("/v1beta/models/{model_action}")
+    async def generate_content(model_action: str, request: Request):
+        counters["requests"] += 1
+        key = request.query_params.get("key", "")
+        counters["per_key"][key[-4:]] = counters["per_key"].get(key[-4:], 0) + 1
+        if key in forbidden_keys:
+            counters["forbidden"] += 1
+            return JSONResponse(status_code=403, content={"error": {"code": 403, "status": "PERMISSION_DENIED"}})
+        if over_key_quota(key):
+            counters["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "details": [{"retryDelay": f"{args.retry_after_seconds}s"}]}},
+            )
+        payload = await request.json()
+        text = payload["contents"][0]["parts"][0]["text"]
+        delay = max(0.0, rng.gauss(args.latency_ms, args.jitter_ms) if args.jitter_ms else args.latency_ms) / 1000
+        await asyncio.sleep(delay)
+
+        roll = rng.random()
+        if roll < args.rate_429:
+            counters["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "details": [{"retryDelay": f"{args.retry_after_seconds}s"}]}},
+            )
+        if roll < args.rate_429 + args.rate_5xx:
+            counters["server_errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"code": 503, "status": "UNAVAILABLE"}})
+
+        counters["ok"] += 1
+        sample_count = int(audio_seconds_for(text) * args.sample_rate)
+        return {
+            "candidates": [{"content": {"parts": [{"inlineData": {"mimeType": f"audio/L16;rate={args.sample_rate}", "data": pcm_base64(sample_count)}}]}}]
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Gemini generateContent server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Mean response latency.")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="Standard deviation of the latency.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--key-rpm", type=float, default=0.0, help="Requests per minute allowed per API key before 429s (0 = unlimited).")
+    parser.add_argument("--forbidden-keys", default="", help="Comma-separated API keys answered with 403.")
+    parser.add_argument("--retry-after-seconds", type=float, default=1.0, help="retryDelay reported with 429s.")
+    parser.add_argument("--chars-per-second", type=float, default=15.0, help="Speech rate used to size the returned audio.")
+    parser.add_argument("--audio-seconds", type=float, default=0.0, help="Fixed audio length per request (overrides --chars-per-second).")
+    parser.add_argument("--sample-rate", type=int, default=24000)
+    parser.add_argument("--seed", type=int, default=1234)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level="warning")
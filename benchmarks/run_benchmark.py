@@ -0,0 +1,412 @@
+"""
+Benchmark harness for /api/synthesize.
+
+Starts the mock Gemini server and a TTS server configured to use it, then
+drives /api/synthesize over a matrix of concurrency levels, text lengths,
+audio formats and response modes (buffered / streamed). Reports latency
+percentiles, time-to-first-byte, jobs/sec and the server's peak RSS as JSON,
+along with the server's cold-start time (launch to first answered request)
+and the per-request overhead of the page, static files, /api/config and
+/api/voices (full responses and ETag revalidations).
+
+    python benchmarks/run_benchmark.py --concurrency 1,8 --text-lengths 1000,10000 \\
+        --formats wav,mp3 --output results.json
+    python benchmarks/run_benchmark.py --output after.json --compare results.json
+
+Use --server-url to benchmark an already running server instead (it must be
+configured with gemini_api_base_url pointing at a mock or real API).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import toml
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+_SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "She sells sea shells by the sea shore, and the shells she sells are surely seashells.",
+    "How much wood would a woodchuck chuck if a woodchuck could chuck wood?",
+    "A journey of a thousand miles begins with a single step!",
+    "Peter Piper picked a peck of pickled peppers.",
+    "It was the best of times, it was the worst of times, it was the age of wisdom.",
+]
+
+def make_text(length: int, salt: int) -> str:
+    """Deterministic prose of roughly `length` characters; `salt` keeps texts distinct between requests."""
+    parts, size, i = [f"Request {salt}."], 0, salt
+    while size < length:
+        sentence = _SENTENCES[i % len(_SENTENCES)]
+        parts.append(sentence)
+        size += len(sentence) + 1
+        i += 1
+    return " ".join(parts)[:max(length, 1)]
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(p: float) -> float:
+        pos = (len(ordered) - 1) * p
+        low, high = int(pos), min(int(pos) + 1, len(ordered) - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+    return {
+        "p50": round(pick(0.50), 2), "p95": round(pick(0.95), 2), "p99": round(pick(0.99), 2),
+        "mean": round(sum(ordered) / len(ordered), 2), "max": round(ordered[-1], 2),
+    }
+
+def read_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Current resident set size of `pid` in MB (Linux /proc only)."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+class RSSSampler:
+    """Samples a process's RSS in the background and keeps the peak."""
+    def __init__(self, pid: Optional[int], interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = None
+        self._task = None
+
+    async def _run(self):
+        while True:
+            rss = read_rss_mb(self.pid)
+            if rss is not None:
+                self.peak_mb = rss if self.peak_mb is None else max(self.peak_mb, rss)
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+async def one_request(client: httpx.AsyncClient, base_url: str, body: Dict) -> Dict:
+    started = time.perf_counter()
+    ttfb, size, status, error = None, 0, None, None
+    try:
+        async with client.stream("POST", f"{base_url}/api/synthesize", json=body) as response:
+            status = response.status_code
+            async for data in response.aiter_raw():
+                if ttfb is None and data:
+                    ttfb = time.perf_counter() - started
+                size += len(data)
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "status": status, "error": error, "bytes": size,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "ttfb_ms": ttfb * 1000 if ttfb is not None else None,
+    }
+
+async def run_scenario(base_url: str, server_pid: Optional[int], scenario: Dict, args) -> Dict:
+    """Sends `args.requests` requests with `concurrency` in flight and summarizes them."""
+    semaphore = asyncio.Semaphore(scenario["concurrency"])
+    limits = httpx.Limits(max_connections=scenario["concurrency"] + 2)
+
+    async def worker(index: int, client: httpx.AsyncClient):
+        body = {
+            "task_id": str(uuid.uuid4()),
+            "text": make_text(scenario["text_chars"], index),
+            "voice_name": args.voice,
+            "audio_format": scenario["format"],
+            "chunk_size_chars": args.chunk_size,
+            "stream": scenario["mode"] == "stream",
+        }
+        if args.chunk_concurrency:
+            body["chunk_concurrency"] = args.chunk_concurrency
+        async with semaphore:
+            return await one_request(client, base_url, body)
+
+    async with httpx.AsyncClient(timeout=args.request_timeout, limits=limits) as client:
+        with RSSSampler(server_pid) as sampler:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(worker(i, client) for i in range(args.requests)))
+            wall = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == 200 and r["error"] is None]
+    status_counts: Dict[str, int] = {}
+    for r in results:
+        key = str(r["status"]) if r["error"] is None else "transport_error"
+        status_counts[key] = status_counts.get(key, 0) + 1
+    return {
+        **scenario,
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "status_counts": status_counts,
+        "wall_seconds": round(wall, 3),
+        "jobs_per_second": round(len(ok) / wall, 3) if wall > 0 else None,
+        "latency_ms": percentiles([r["latency_ms"] for r in ok]),
+        "ttfb_ms": percentiles([r["ttfb_ms"] for r in ok if r["ttfb_ms"] is not None]),
+        "mean_response_bytes": round(sum(r["bytes"] for r in ok) / len(ok)) if ok else None,
+        "peak_rss_mb": round(sampler.peak_mb, 1) if sampler.peak_mb is not None else None,
+    }
+
+async def wait_until_up(url: str, timeout: float = 30.0, poll_interval: float = 0.1):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(poll_interval)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+def write_bench_config(args, mock_url: str) -> str:
+    """Copies config.toml with the API base URL pointed at the mock and limits opened up."""
+    config = toml.load(REPO_ROOT / "config.toml")
+    config.update({
+        "gemini_api_base_url": mock_url,
+        "chunk_cache_enabled": args.cache,
+        "rate_limit_requests_per_minute": args.rate_limit_rpm,
+        "rate_limit_chars_per_minute": args.rate_limit_rpm * 5000,
+        "job_max_queue": max(config.get("job_max_queue", 32), args.requests),
+        "encoder_max_queue": max(config.get("encoder_max_queue", 16), args.requests),
+    })
+    handle, path = tempfile.mkstemp(prefix="tts-bench-", suffix=".toml")
+    with os.fdopen(handle, "w") as f:
+        toml.dump(config, f)
+    return path
+
+def start_processes(args):
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    mock = subprocess.Popen([
+        sys.executable, str(REPO_ROOT / "benchmarks" / "mock_gemini.py"), "--port", str(args.mock_port),
+        "--latency-ms", str(args.mock_latency_ms), "--jitter-ms", str(args.mock_jitter_ms),
+        "--rate-429", str(args.mock_rate_429), "--rate-5xx", str(args.mock_rate_5xx),
+        "--chars-per-second", str(args.mock_chars_per_second), "--key-rpm", str(args.mock_key_rpm),
+    ])
+    config_path = write_bench_config(args, mock_url)
+    server = start_server(args, config_path, args.server_port)
+    return mock, server, mock_url, config_path
+
+def start_server(args, config_path: str, port: int) -> subprocess.Popen:
+    key_env_var = toml.load(REPO_ROOT / "config.toml").get("gemini_api_key_env_var", "GEMINI_API_KEY")
+    api_keys = ",".join(f"AIza-benchmark-mock-key-{i:013d}" for i in range(args.api_keys))
+    env = {**os.environ, "GEMINI_TTS_CONFIG": config_path, key_env_var: api_keys}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+
+async def measure_cold_start(args, config_path: str) -> Dict:
+    """Launches fresh server processes and times launch -> first answered /api/config and /."""
+    port = args.server_port + 1
+    ready, first_page = [], []
+    for _ in range(args.cold_start_runs):
+        started = time.perf_counter()
+        server = start_server(args, config_path, port)
+        try:
+            await wait_until_up(f"http://127.0.0.1:{port}/api/config", poll_interval=0.01)
+            ready.append((time.perf_counter() - started) * 1000)
+            async with httpx.AsyncClient() as client:
+                request_started = time.perf_counter()
+                await client.get(f"http://127.0.0.1:{port}/")
+                first_page.append((time.perf_counter() - request_started) * 1000)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+    return {"runs": args.cold_start_runs, "ready_ms": percentiles(ready), "first_page_ms": percentiles(first_page)}
+
+async def measure_request_overhead(base_url: str, args) -> List[Dict]:
+    """Sequential GETs of the lightweight endpoints: full (gzip) responses, then ETag revalidations."""
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, headers={"Accept-Encoding": "gzip, br"}) as client:
+        page = await client.get("/")
+        static_urls = sorted(set(re.findall(r'"(/static/[^"]+\.(?:js|css)[^"]*)"', page.text)))
+        for path in ["/", *static_urls, "/api/config", "/api/voices"]:
+            etag = (await client.get(path)).headers.get("etag")
+            for revalidate in (False, True):
+                if revalidate and not etag:
+                    continue
+                headers = {"If-None-Match": etag} if revalidate else {}
+                latencies, size, status = [], 0, None
+                for _ in range(args.overhead_requests):
+                    started = time.perf_counter()
+                    response = await client.get(path, headers=headers)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    size, status = len(response.content), response.status_code
+                results.append({
+                    "path": path.split("?")[0], "revalidate": revalidate, "status": status,
+                    "wire_bytes": int(response.headers.get("content-length", size)),
+                    "latency_ms": percentiles(latencies),
+                })
+    return results
+
+def compare(current: Dict, baseline_path: str):
+    """Prints per-scenario deltas against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def key(s):
+        return (s["format"], s["mode"], s["concurrency"], s["text_chars"])
+
+    def ms(new, prev):
+        if new is None or prev is None:
+            return f"{'n/a':>19}"
+        change = (new - prev) / prev * 100 if prev else 0.0
+        return f"{new:>9.2f} ({change:+5.1f}%)"
+
+    if current.get("cold_start") and baseline.get("cold_start"):
+        print(f"\n{'cold start':<32} {'p50 ms':>19}")
+        for field in ("ready_ms", "first_page_ms"):
+            print(f"{field:<32} {ms(current['cold_start'][field]['p50'], baseline['cold_start'][field]['p50'])}")
+    old_overhead = {(o["path"], o["revalidate"]): o for o in baseline.get("request_overhead", [])}
+    if current.get("request_overhead") and old_overhead:
+        print(f"\n{'request overhead':<32} {'p50 ms':>19} {'bytes':>19}")
+        for o in current["request_overhead"]:
+            prev = old_overhead.get((o["path"], o["revalidate"]))
+            if prev is None:
+                continue
+            name = f"{o['path']}{' (304)' if o['revalidate'] else ''}"
+            print(f"{name:<32} {ms(o['latency_ms']['p50'], prev['latency_ms']['p50'])} {o['wire_bytes']:>9} ({prev['wire_bytes']:>7})")
+
+    before = {key(s): s for s in baseline["scenarios"]}
+    print(f"\n{'scenario':<32} {'p50 ms':>19} {'p95 ms':>19} {'ttfb p50 ms':>19} {'jobs/s':>19}")
+    for s in current["scenarios"]:
+        old = before.get(key(s))
+        if old is None:
+            continue
+
+        def cell(new, prev):
+            if new is None or prev is None:
+                return f"{'n/a':>19}"
+            change = (new - prev) / prev * 100 if prev else 0.0
+            return f"{new:>9.1f} ({change:+5.1f}%)"
+
+        name = f"{s['format']}/{s['mode']} c={s['concurrency']} n={s['text_chars']}"
+        print(f"{name:<32} {cell(s['latency_ms']['p50'], old['latency_ms']['p50'])} "
+              f"{cell(s['latency_ms']['p95'], old['latency_ms']['p95'])} "
+              f"{cell(s['ttfb_ms']['p50'], old['ttfb_ms']['p50'])} "
+              f"{cell(s['jobs_per_second'], old['jobs_per_second'])}")
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def _str_list(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /api/synthesize against a mock Gemini API.")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="Comma-separated concurrent request counts.")
+    parser.add_argument("--text-lengths", type=_int_list, default=[500, 5000], help="Comma-separated text lengths in characters.")
+    parser.add_argument("--formats", type=_str_list, default=["wav", "mp3"], help="Comma-separated audio formats.")
+    parser.add_argument("--modes", type=_str_list, default=["buffered", "stream"], help="buffered and/or stream.")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per scenario.")
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--chunk-concurrency", type=int, default=None)
+    parser.add_argument("--voice", default="Kore")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--cache", action="store_true", help="Leave the chunk cache enabled (disabled by default).")
+    parser.add_argument("--rate-limit-rpm", type=int, default=100000, help="Rate limiter budget (per API key) given to the server under test.")
+    parser.add_argument("--api-keys", type=int, default=1, help="Number of API keys given to the server under test.")
+    parser.add_argument("--server-url", default=None, help="Benchmark this running server instead of starting one.")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID of --server-url's process, for RSS sampling.")
+    parser.add_argument("--server-port", type=int, default=8010)
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--mock-latency-ms", type=float, default=500.0)
+    parser.add_argument("--mock-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--mock-rate-429", type=float, default=0.0)
+    parser.add_argument("--mock-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--mock-chars-per-second", type=float, default=15.0)
+    parser.add_argument("--mock-key-rpm", type=float, default=0.0, help="Per-key quota enforced by the mock with 429s (0 = unlimited).")
+    parser.add_argument("--cold-start-runs", type=int, default=3, help="Fresh server launches timed to the first answered request (0 = skip; skipped with --server-url).")
+    parser.add_argument("--overhead-requests", type=int, default=200, help="Sequential GETs per lightweight endpoint for the per-request overhead table (0 = skip).")
+    parser.add_argument("--output", default=None, help="Write JSON results here (default: stdout).")
+    parser.add_argument("--compare", default=None, help="Earlier results file to print deltas against.")
+    return parser.parse_args(argv)
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def main(args) -> Dict:
+    processes, config_path = [], None
+    base_url, server_pid = args.server_url, args.server_pid
+    try:
+        if base_url is None:
+            mock, server, mock_url, config_path = start_processes(args)
+            processes = [server, mock]
+            base_url, server_pid = f"http://127.0.0.1:{args.server_port}", server.pid
+            await wait_until_up(f"{mock_url}/stats")
+        await wait_until_up(f"{base_url}/api/config")
+
+        cold_start = None
+        if config_path and args.cold_start_runs > 0:
+            print(f"Measuring cold start ({args.cold_start_runs} launches) ...", file=sys.stderr)
+            cold_start = await measure_cold_start(args, config_path)
+        overhead = []
+        if args.overhead_requests > 0:
+            print("Measuring per-request overhead ...", file=sys.stderr)
+            overhead = await measure_request_overhead(base_url, args)
+
+        scenarios = []
+        for fmt in args.formats:
+            for mode in args.modes:
+                for text_chars in args.text_lengths:
+                    for concurrency in args.concurrency:
+                        scenario = {"format": fmt, "mode": mode, "text_chars": text_chars, "concurrency": concurrency}
+                        print(f"Running {scenario} ...", file=sys.stderr)
+                        scenarios.append(await run_scenario(base_url, server_pid, scenario, args))
+        return {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "git_revision": _git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            },
+            "cold_start": cold_start,
+            "request_overhead": overhead,
+            "scenarios": scenarios,
+        }
+    finally:
+        for proc in processes:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if config_path:
+            os.unlink(config_path)
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(main(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    if args.compare:
+        compare(results, args.compare)
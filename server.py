@@ -16,10 +16,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Import HOST and PORT from the tts_client where config is loaded
-from app.tts_client import SERVER_HOST_CONFIG, SERVER_PORT_CONFIG
+from app.tts_client import SERVER_HOST_CONFIG, SERVER_PORT_CONFIG, SERVER_WORKERS_CONFIG, state_backend
 
 HOST = SERVER_HOST_CONFIG if SERVER_HOST_CONFIG else "127.0.0.1"
 PORT = SERVER_PORT_CONFIG if SERVER_PORT_CONFIG else 8008 
+WORKERS = max(1, int(SERVER_WORKERS_CONFIG or 1))
 APP_MODULE = "app.main:app"
 
 def open_browser_after_delay():
@@ -45,7 +46,12 @@ if __name__ == "__main__":
     else:
         logger.info("Server is reloading (GEMINI_TTS_SERVER_BROWSER_OPENED=true); browser will not be opened again.")
 
-    logger.info(f"Starting Uvicorn server for {APP_MODULE} on http://{HOST}:{PORT} (reload enabled)")
+    if WORKERS > 1 and not state_backend.shared:
+        logger.warning(
+            f"server_workers = {WORKERS} with a process-local state backend: cancellation and job status "
+            "requests only work when they reach the worker that owns the task. Set state_backend to \"sqlite\" or \"redis\"."
+        )
+    logger.info(f"Starting Uvicorn server for {APP_MODULE} on http://{HOST}:{PORT} with {WORKERS} worker(s)")
     
     try:
         uvicorn.run(
@@ -53,7 +59,7 @@ if __name__ == "__main__":
             host=HOST, 
             port=PORT, 
             reload=False, # Changed to False for stability if reloader is problematic
-            workers=1 
+            workers=WORKERS
         )
     except KeyboardInterrupt:
         logger.info("\nServer shutdown initiated by user (Ctrl+C).")
@@ -0,0 +1,25 @@
+import asyncio
+
+from app.job_queue import JobManager
+from app.state_backend import FakeRedis, RedisStateBackend
+
+def test_checkpointed_output_is_served_by_another_host(tmp_path):
+    output = tmp_path / "output.wav"
+    output.write_bytes(b"RIFF audio")
+
+    async def runner(job):
+        return output, "audio/wav"
+
+    async def scenario():
+        # One Redis, two hosts: only the owner can read its checkpoint directory
+        client = FakeRedis()
+        owner = JobManager(runner, 1, 10, 60, 5, RedisStateBackend(client))
+        other = JobManager(runner, 1, 10, 60, 5, RedisStateBackend(client))
+        await owner.start()
+        job = await owner.submit({}, "client")
+        await job.done.wait()
+        await owner.stop()
+        output.unlink()
+        return (await other.describe(job.id))["status"], await other.get_result(job.id)
+
+    assert asyncio.run(scenario()) == ("completed", (b"RIFF audio", "audio/wav"))
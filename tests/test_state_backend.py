@@ -0,0 +1,94 @@
+import asyncio
+import types
+
+import pytest
+
+from app import state_backend
+from app.state_backend import FakeRedis, MemoryStateBackend, RedisStateBackend, SQLiteStateBackend, StateBackend
+from app.task_registry import TaskRegistry
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backends(request, tmp_path):
+    """Two backend instances over the same state, as two worker processes would hold them."""
+    if request.param == "memory":
+        # Process-local: the only instance that can see the state is the same one
+        backend = MemoryStateBackend()
+        pair = (backend, backend)
+    elif request.param == "sqlite":
+        path = str(tmp_path / "state.sqlite3")
+        pair = (SQLiteStateBackend(path), SQLiteStateBackend(path))
+    else:
+        client = FakeRedis()
+        pair = (RedisStateBackend(client), RedisStateBackend(client))
+    yield pair
+    for backend in set(pair):
+        backend.close()
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(state_backend, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+def test_cancel_flag_is_seen_by_another_instance(backends):
+    first, second = backends
+    first.set_cancelled("t1", 60)
+    assert second.cancelled_among(["t1", "t2"]) == {"t1"}
+    second.clear_cancelled("t1")
+    assert first.cancelled_among(["t1"]) == set()
+    assert first.cancelled_among([]) == set()
+
+def test_register_clears_a_stale_cancel_flag(backends):
+    async def scenario():
+        first, second = (TaskRegistry(backend) for backend in backends)
+        await first.register("t1")
+        await first.cancel("t1")
+        first.unregister("t1")
+        # The same id started again, through the other worker
+        await second.register("t1")
+        return second.sync_remote_cancellations(), second.is_cancelled("t1")
+
+    assert asyncio.run(scenario()) == (set(), False)
+
+def test_remote_cancel_reaches_the_other_worker(backends):
+    async def scenario():
+        first, second = (TaskRegistry(backend) for backend in backends)
+        await second.register("t1")
+        await first.cancel("t1")
+        return second.sync_remote_cancellations(), second.is_cancelled("t1")
+
+    first, second = backends
+    expected = ({"t1"}, True) if first.shared else (set(), False)
+    assert asyncio.run(scenario()) == expected
+
+def test_job_snapshot_round_trip(backends):
+    first, second = backends
+    snapshot = {"id": "j1", "status": "running", "progress": {"done": 2, "total": 5}, "error": None}
+    first.put_job("j1", snapshot, 60)
+    assert second.get_job("j1") == snapshot
+    assert second.get_job("missing") is None
+
+def test_result_round_trip(backends):
+    first, second = backends
+    audio = b"RIFF\n\x00\x01binary\nbytes"
+    first.put_result("j1", audio, "audio/wav", 60)
+    assert second.get_result("j1") == (audio, "audio/wav")
+    assert second.get_result("missing") is None
+
+def test_entries_expire_after_their_ttl(backends, clock):
+    first, second = backends
+    first.put_result("j1", b"audio", "audio/mpeg", 10)
+    first.put_job("j1", {"status": "completed"}, 10)
+    first.set_cancelled("t1", 10)
+    clock[0] += 9
+    assert second.get_result("j1") == (b"audio", "audio/mpeg")
+    assert second.get_job("j1") == {"status": "completed"}
+    assert second.cancelled_among(["t1"]) == {"t1"}
+    clock[0] += 2
+    assert second.get_result("j1") is None
+    assert second.get_job("j1") is None
+    assert second.cancelled_among(["t1"]) == set()
@@ -0,0 +1,33 @@
+import asyncio
+
+from app.task_registry import TaskRegistry
+
+def test_cancel_after_detach_does_not_reach_the_task():
+    async def scenario():
+        registry = TaskRegistry()
+        await registry.register("t1")
+        task = asyncio.current_task()
+        registry.attach("t1", task)
+        # The interrupt is looked up while attached but delivered after the
+        # task has detached and moved on to unrelated work
+        await registry.cancel("t1")
+        registry.detach("t1", task)
+        await asyncio.sleep(0.05)
+        return task.cancelling()
+
+    assert asyncio.run(scenario()) == 0
+
+def test_repeated_cancel_interrupts_once():
+    async def scenario():
+        registry = TaskRegistry()
+        await registry.register("t1")
+        worker = asyncio.create_task(asyncio.sleep(10))
+        registry.attach("t1", worker)
+        await registry.cancel("t1")
+        await registry.cancel("t1")
+        await asyncio.sleep(0)
+        cancelling = worker.cancelling()
+        await asyncio.gather(worker, return_exceptions=True)
+        return cancelling, registry.is_cancelled("t1")
+
+    assert asyncio.run(scenario()) == (1, True)
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from app.text_splitter import SENTENCE, iter_chunk_spans, punctuation_breaks
+from benchmarks.bench_splitter import legacy_split
+
+_PIECES = [
+    "a", "to", "word", "sentence", "Mr.", "e.g.", "3.14", "example.com", "x" * 30, "https://example.com/" + "p" * 40,
+    "Hi!", "why?", "end.", "semi;", "“quoted.”", "(aside)", "—", "...", "東京", "。", "，", "、", "\n", "\n\n", "\t",
+]
+
+def _random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(_PIECES) + rng.choice(["", " ", " ", "  "]) for _ in range(rng.randint(1, 60)))
+
+def _spans(text: str, max_length: int) -> list:
+    """iter_chunk_spans, checked against the invariants every split must keep."""
+    spans = list(iter_chunk_spans(text, max_length))
+    previous = 0
+    for start, end in spans:
+        assert 0 < end - start <= max_length
+        assert not text[start].isspace() and not text[end - 1].isspace()
+        # Only whitespace is left out between chunks
+        assert previous <= start and text[previous:start].strip() == ""
+        previous = end
+    assert text[previous:].strip() == ""
+    return spans
+
+def test_random_texts_keep_invariants_and_never_need_more_chunks_than_legacy():
+    rng = random.Random(7)
+    for _ in range(3000):
+        text, max_length = _random_text(rng), rng.randint(3, 80)
+        assert len(_spans(text, max_length)) <= len(legacy_split(text, max_length))
+
+def test_short_text_is_one_chunk():
+    assert _spans("  Hello there.  ", 100) == [(2, 14)]
+    assert _spans(" \n ", 100) == []
+
+def test_abbreviation_is_not_a_sentence_break():
+    text = "We met Mr. Brown at noon. Then we left."
+    sentences = [text[:pos] for pos, strength, _ in punctuation_breaks(text, 0, len(text)) if strength == SENTENCE]
+    assert sentences == ["We met Mr. Brown at noon.", text]
+
+def test_cjk_text_is_cut_after_its_punctuation():
+    text = "东京是日本的首都。人口很多，交通很方便。" * 4
+    chunks = [text[start:end] for start, end in _spans(text, 25)]
+    assert all(chunk[-1] in "。，" for chunk in chunks)
+
+def test_paragraph_break_is_preferred():
+    first = "The first paragraph has one sentence. And a second one."
+    second = "The next paragraph follows here. It ends, too."
+    text = first + "\n\n" + second
+    chunks = [text[start:end] for start, end in _spans(text, 70)]
+    assert chunks == [first, second]
+
+def test_over_long_word_is_cut_hard():
+    text = "a" * 25
+    chunks = [text[start:end] for start, end in _spans(text, 10)]
+    assert len(chunks) == 3 and "".join(chunks) == text
+
+def test_url_after_short_sentence_takes_two_chunks():
+    text = "Intro text here. " + "x" * 320 + " tail words"
+    # Anchoring hard cuts at the start of the word used to make this three
+    assert len(_spans(text, 200)) == 2
+
+@pytest.mark.parametrize("run", ["。", "—"])
+def test_long_punctuation_run_splits_in_linear_time(run):
+    text = run * 1_000_000
+    spans = _spans(text, 4500)
+    assert len(spans) == -(-len(text) // 4500)